@@ -0,0 +1,131 @@
+import re
+
+# Locating claims in the page text they were extracted from.
+#
+# The model quotes claims, but not always verbatim: it changes case, quotes
+# and whitespace, drops a trailing full stop or paraphrases. An exact search
+# on a normalized copy of the text handles the first group; otherwise the
+# sentence sharing the most claim words is found through an inverted index
+# built once per page, and narrowed to the run of words the claim uses.
+
+_TOKEN_RE = re.compile(r"\w+")
+_SENTENCE_RE = re.compile(r"[^.!?\n]+(?:[.!?]+[\"'”’)\]]*|$)", re.MULTILINE)
+_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+# Too common to identify a sentence on their own
+STOPWORDS = frozenset(
+    "a an the and or but if of to in on at by for with from as is are was were be been being it its "
+    "this that these those can may will would should could do does did not no so than then there "
+    "their they you your we our he she his her them which who what when how all any some more most".split()
+)
+
+MIN_FUZZY_SCORE = 0.6
+
+
+def _normalize(text):
+    """Lowercase, straighten quotes and collapse whitespace runs to one space.
+
+    Returns (normalized text, original offset of each normalized character).
+    Characters whose lowercase form changes length are kept as they are so
+    the offsets stay one-to-one.
+    """
+    chars = []
+    offsets = []
+    in_space = False
+    for position, char in enumerate(text.translate(_QUOTES)):
+        if char.isspace():
+            if not in_space and chars:
+                chars.append(" ")
+                offsets.append(position)
+            in_space = True
+            continue
+        in_space = False
+        lower = char.lower()
+        chars.append(lower if len(lower) == 1 else char)
+        offsets.append(position)
+    return "".join(chars), offsets
+
+
+def _claim_needle(claim_text):
+    needle, _ = _normalize(claim_text.strip())
+    return needle.strip(" \"'").rstrip(".!?;:,").strip()
+
+
+def _content_tokens(tokens):
+    content = {token for token in tokens if token not in STOPWORDS}
+    return content or set(tokens)
+
+
+class ClaimAligner:
+    """Maps claim texts to character spans in ``text``; build once per page"""
+
+    def __init__(self, text, min_score=MIN_FUZZY_SCORE):
+        self.text = text
+        self.min_score = min_score
+        self._normalized, self._offsets = _normalize(text)
+        self._sentences = None
+        self._index = None
+
+    def _build_index(self):
+        # Each sentence keeps its (token, start, end) list for narrowing fuzzy matches
+        self._sentences = []
+        self._index = {}
+        for match in _SENTENCE_RE.finditer(self.text):
+            tokens = [(m.group(0).lower(), match.start() + m.start(), match.start() + m.end())
+                      for m in _TOKEN_RE.finditer(match.group(0))]
+            if not tokens:
+                continue
+            sentence_id = len(self._sentences)
+            self._sentences.append(tokens)
+            for token in {token for token, _, _ in tokens}:
+                self._index.setdefault(token, []).append(sentence_id)
+
+    def _exact(self, needle):
+        spans = []
+        start = self._normalized.find(needle)
+        while start != -1:
+            end = start + len(needle)
+            spans.append([self._offsets[start], self._offsets[end - 1] + 1])
+            start = self._normalized.find(needle, end)
+        return spans
+
+    def _fuzzy(self, claim_text):
+        if self._index is None:
+            self._build_index()
+        claim_tokens = _content_tokens([m.group(0).lower() for m in _TOKEN_RE.finditer(claim_text)])
+        if not claim_tokens:
+            return None, 0.0
+        hits = {}
+        for token in claim_tokens:
+            for sentence_id in self._index.get(token, ()):
+                hits[sentence_id] = hits.get(sentence_id, 0) + 1
+        if not hits:
+            return None, 0.0
+        # Most claim words covered; on a tie, the shorter (more specific) sentence
+        best = max(hits, key=lambda sentence_id: (hits[sentence_id], -len(self._sentences[sentence_id])))
+        score = hits[best] / len(claim_tokens)
+        if score < self.min_score:
+            return None, score
+        matched = [(start, end) for token, start, end in self._sentences[best] if token in claim_tokens]
+        return [matched[0][0], matched[-1][1]], score
+
+    def locate(self, claim_text):
+        """Return (spans, score): every exact occurrence with score 1.0, else the best
+        fuzzy match, else ([], best score seen)"""
+        if not claim_text or not claim_text.strip():
+            return [], 0.0
+        needle = _claim_needle(claim_text)
+        if needle:
+            spans = self._exact(needle)
+            if spans:
+                return spans, 1.0
+        span, score = self._fuzzy(claim_text)
+        return ([span] if span else []), round(score, 3)
+
+    def annotate(self, claims):
+        """Copies of ``claims`` with "spans" ([[start, end], ...] into the text) and "span_score" """
+        annotated = []
+        for claim in claims:
+            spans, score = self.locate(claim.get("claim_text") or "")
+            annotated.append(dict(claim, spans=spans, span_score=score))
+        return annotated
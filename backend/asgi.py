@@ -0,0 +1,28 @@
+"""ASGI serving mode for the HealthGuard API.
+
+    uvicorn asgi:asgi_app --host 0.0.0.0 --port 5000
+    python asgi.py
+
+The event loop accepts and buffers connections while the Flask handlers run on
+a pool of up to HEALTHGUARD_ASGI_MAX_IN_FLIGHT worker threads, so hundreds of
+requests can wait on Gemini at once. Upstream calls share one model client and
+are capped process-wide by HEALTHGUARD_MAX_UPSTREAM_CONCURRENCY.
+"""
+from a2wsgi import WSGIMiddleware
+
+import config
+from app import app, logger, warm_up
+
+asgi_app = WSGIMiddleware(app, workers=config.ASGI_MAX_IN_FLIGHT)
+
+# Optionally load the model client and Pillow before the first request arrives
+if config.WARMUP_ON_START:
+    logger.info(f"Warmed up (ms): {warm_up()}")
+
+if __name__ == "__main__":
+    import uvicorn
+
+    logger.info("🏥 Starting HealthGuard API Server (ASGI mode)...")
+    logger.info(f"🔀 Up to {config.ASGI_MAX_IN_FLIGHT} in-flight requests, "
+                f"{config.MAX_UPSTREAM_CONCURRENCY} concurrent Gemini calls")
+    uvicorn.run(asgi_app, host="0.0.0.0", port=5000)
@@ -0,0 +1,251 @@
+"""Audit a whole site crawl offline with the same pipeline as /scan-page.
+
+Run from the backend directory:
+
+    python -m audit --input crawl.jsonl --output audit.jsonl --workers 8
+
+Each input line is a JSON object with "text" and optionally "url" and "id"
+(the id defaults to the url, then to the line number). Pages are scanned in a
+pool of worker processes; each worker runs scan_page_text() from app.py, so
+prefiltering, chunking, verdict reuse and decoding behave as they do for the
+extension. ``--upstream-concurrency`` and ``--upstream-rpm`` are totals and
+are split evenly across the workers' schedulers.
+
+One {"type": "page", ...} record is written per page, holding the claims,
+statistics and chunk counts of the /scan-page response. The output file is
+also the checkpoint: re-running the same command skips pages already in it
+and continues after the last complete line. Pages with an "error" (the
+upstream turned them away, or some chunks failed) are retried; when a page
+appears more than once, its last record wins. Each run ends with a {"type": "summary", ...} record holding
+throughput and statistics over the whole corpus.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from scanner import calculate_statistics
+
+logger = logging.getLogger("audit")
+
+# Set by _init_worker in each worker process
+_app = None
+_overload_attempts = 3
+
+
+def _init_worker(env, log_level, overload_attempts):
+    global _app, _overload_attempts
+    # config.py reads the environment at import, so the per-worker share of the
+    # upstream limits must be in place before the app is imported
+    os.environ.update(env)
+    import app
+    logging.getLogger().setLevel(log_level)
+    _app = app
+    _overload_attempts = overload_attempts
+
+
+def _audit_page(page_id, url, text):
+    """Scan one page in a worker process; returns the output record"""
+    started = time.perf_counter()
+    record = {"type": "page", "id": page_id, "url": url}
+    output = None
+    for attempt in range(1, _overload_attempts + 1):
+        try:
+            output = _app.scan_page_text(text, url)
+            break
+        except _app.UpstreamOverloaded as e:
+            if attempt == _overload_attempts:
+                record["error"] = f"Upstream overloaded: {e}"
+                break
+            time.sleep(e.retry_after)
+        except Exception as e:
+            record["error"] = str(e)
+            break
+    if "error" not in record:
+        record.update(
+            claims=output["claims"],
+            statistics=output["statistics"],
+            chunks_processed=output["chunks_processed"],
+            chunks_failed=output["chunks_failed"],
+            chunks_total=output["chunks_total"],
+            truncated=output["truncated"],
+        )
+        if output["chunks_failed"]:
+            # Keep what was found, but leave the page to be retried on resume
+            record["error"] = f"{output['chunks_failed']} of {output['chunks_processed'] + output['chunks_failed']} chunk(s) failed"
+    record["input_chars"] = len(text)
+    record["seconds"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def read_pages(path):
+    """Yield (page_id, url, text) from a JSONL file, skipping blank, malformed and empty lines"""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                logger.warning(f"{path}:{line_number}: not valid JSON, skipped")
+                continue
+            text = item.get("text") if isinstance(item, dict) else None
+            if not text:
+                logger.warning(f"{path}:{line_number}: no text, skipped")
+                continue
+            url = item.get("url")
+            yield str(item.get("id") or url or f"line-{line_number}"), url, text
+
+
+def load_checkpoint(path):
+    """Read the pages already audited into ``path``.
+
+    Drops a trailing partial line left by a crash, so appending continues on a
+    clean line. Returns (done page ids, their claims' classifications).
+    """
+    done = set()
+    classifications = []
+    if not os.path.exists(path):
+        return done, classifications
+    with open(path, "rb+") as f:
+        data = f.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            logger.warning(f"{path}: dropping {len(data) - complete} bytes of an incomplete record")
+            f.truncate(complete)
+    for line in data[:complete].splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get("type") != "page" or "error" in record:
+            continue
+        done.add(record["id"])
+        classifications.extend(claim.get("classification") for claim in record.get("claims") or [])
+    return done, classifications
+
+
+def worker_env(workers, upstream_concurrency, upstream_rpm):
+    """Environment for one worker: its share of the global upstream limits"""
+    return {
+        "HEALTHGUARD_MAX_UPSTREAM_CONCURRENCY": str(max(1, math.ceil(upstream_concurrency / workers))),
+        "HEALTHGUARD_UPSTREAM_RPM": str(math.ceil(upstream_rpm / workers) if upstream_rpm > 0 else 0),
+        # The share above is already per process; don't divide it again by a server worker count
+        "HEALTHGUARD_WORKERS": "1",
+        # A worker scans one page at a time, so its queue is never deeper than
+        # one page's chunks; only an upstream quota pause should make it wait
+        "HEALTHGUARD_SCHED_WAIT_BACKGROUND": os.environ.get("HEALTHGUARD_SCHED_WAIT_BACKGROUND", "300"),
+    }
+
+
+def run(args):
+    done, classifications = load_checkpoint(args.output)
+    if done:
+        logger.info(f"Resuming: {len(done)} page(s) already audited in {args.output}")
+
+    env = worker_env(args.workers, args.upstream_concurrency, args.upstream_rpm)
+    log_level = logging.INFO if args.verbose else logging.WARNING
+    totals = {"pages": 0, "pages_failed": 0, "claims": 0, "chunks": 0, "chunks_failed": 0, "input_chars": 0}
+    skipped = 0
+    started = time.perf_counter()
+    last_sync = time.monotonic()
+
+    with open(args.output, "a", encoding="utf-8") as out, ProcessPoolExecutor(
+        max_workers=args.workers, initializer=_init_worker, initargs=(env, log_level, args.overload_attempts)
+    ) as pool:
+
+        def write(record):
+            nonlocal last_sync
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            if time.monotonic() - last_sync >= args.checkpoint_seconds:
+                os.fsync(out.fileno())
+                last_sync = time.monotonic()
+
+        def collect(future):
+            record = future.result()
+            totals["pages"] += 1
+            totals["input_chars"] += record["input_chars"]
+            if "error" in record:
+                totals["pages_failed"] += 1
+                logger.warning(f"{record['id']}: {record['error']}")
+            if "claims" in record:
+                totals["claims"] += len(record["claims"])
+                totals["chunks"] += record["chunks_processed"] + record["chunks_failed"]
+                totals["chunks_failed"] += record["chunks_failed"]
+                if "error" not in record:
+                    classifications.extend(claim.get("classification") for claim in record["claims"])
+            write(record)
+            if totals["pages"] % args.progress_every == 0:
+                elapsed = time.perf_counter() - started
+                logger.info(f"{totals['pages']} page(s) audited, {totals['pages'] / elapsed:.1f} pages/s")
+
+        # Keep a bounded window of pages in flight so a huge crawl is never read into memory
+        pending = set()
+        for page_id, url, text in read_pages(args.input):
+            if page_id in done:
+                skipped += 1
+                continue
+            done.add(page_id)
+            pending.add(pool.submit(_audit_page, page_id, url, text))
+            if len(pending) >= args.workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    collect(future)
+        for future in pending:
+            collect(future)
+
+        elapsed = time.perf_counter() - started
+        summary = {
+            "type": "summary",
+            "pages_audited": totals["pages"],
+            "pages_failed": totals["pages_failed"],
+            "pages_skipped": skipped,
+            "claims": totals["claims"],
+            "chunks": totals["chunks"],
+            "chunks_failed": totals["chunks_failed"],
+            "input_chars": totals["input_chars"],
+            "elapsed_seconds": round(elapsed, 3),
+            "pages_per_second": round(totals["pages"] / elapsed, 3) if elapsed else 0.0,
+            "claims_per_second": round(totals["claims"] / elapsed, 3) if elapsed else 0.0,
+            "workers": args.workers,
+            "upstream_concurrency": args.upstream_concurrency,
+            # Over every page in the output file, including earlier runs
+            "statistics": calculate_statistics([{"classification": c} for c in classifications]),
+        }
+        write(summary)
+        os.fsync(out.fileno())
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", required=True, help="JSONL file of pages: {\"text\", \"url\"?, \"id\"?}")
+    parser.add_argument("--output", required=True, help="JSONL file for page records; also the resume checkpoint")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="worker processes")
+    parser.add_argument("--upstream-concurrency", type=int,
+                        default=int(os.environ.get("HEALTHGUARD_MAX_UPSTREAM_CONCURRENCY", 16)),
+                        help="model calls in flight across all workers")
+    parser.add_argument("--upstream-rpm", type=int, default=int(os.environ.get("HEALTHGUARD_UPSTREAM_RPM", 1000)),
+                        help="model calls per minute across all workers (0 = unlimited)")
+    parser.add_argument("--overload-attempts", type=int, default=3,
+                        help="times to retry a page the upstream turned away before recording it as failed")
+    parser.add_argument("--checkpoint-seconds", type=float, default=5.0, help="how often the output is fsynced")
+    parser.add_argument("--progress-every", type=int, default=100, help="log progress every N pages")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's per-page INFO logging")
+    args = parser.parse_args(argv)
+    args.workers = max(1, args.workers)
+    args.progress_every = max(1, args.progress_every)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    summary = run(args)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["pages_failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
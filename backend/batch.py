@@ -0,0 +1,94 @@
+import contextvars
+import logging
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Upper bound for a single claim, matching the /validate content limit
+MAX_CLAIM_CHARS = 2000
+
+
+def estimate_tokens(text):
+    """Rough input-token estimate for Gemini (~4 characters per token)"""
+    return math.ceil(len(text) / 4)
+
+
+def format_claim_line(index, claim_text):
+    """One numbered line per claim; the number is echoed back by the model as "index" """
+    claim_text = _WHITESPACE_RE.sub(" ", claim_text).strip()[:MAX_CLAIM_CHARS]
+    return f"[{index}] {claim_text}"
+
+
+def pack_claims(indexed_claims, token_budget, overhead_tokens, max_claims_per_pack):
+    """Greedily pack (index, claim_text) pairs into as few prompts as the token budget allows.
+
+    ``overhead_tokens`` is the cost of the prompt template itself. A claim that
+    does not fit next to others still gets a pack of its own.
+    """
+    packs = []
+    current = []
+    current_tokens = overhead_tokens
+    for index, claim_text in indexed_claims:
+        line_tokens = estimate_tokens(format_claim_line(index, claim_text)) + 1
+        full = len(current) >= max_claims_per_pack or current_tokens + line_tokens > token_budget
+        if current and full:
+            packs.append(current)
+            current = []
+            current_tokens = overhead_tokens
+        current.append((index, claim_text))
+        current_tokens += line_tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+def format_pack(pack):
+    return "\n".join(format_claim_line(index, claim_text) for index, claim_text in pack)
+
+
+def map_pack_results(pack, output):
+    """Map the model's "results" array back to input indices.
+
+    Results are matched on their "index" field first; results without a usable
+    index then fill the slots no result claimed, in order.
+    """
+    expected = [index for index, _ in pack]
+    results = [result for result in output.get("results") or [] if isinstance(result, dict)]
+    mapped = {}
+    unindexed = []
+    for result in results:
+        index = result.get("index")
+        if isinstance(index, int) and index in expected:
+            mapped.setdefault(index, result)
+        else:
+            unindexed.append(result)
+    empty = [index for index in expected if index not in mapped]
+    for index, result in zip(empty, unindexed):
+        mapped[index] = result
+    return mapped
+
+
+def run_packs(packs, pack_fn, max_workers):
+    """Run ``pack_fn`` over every pack in a bounded thread pool.
+
+    Returns a list with either the pack's output or the exception it raised,
+    so one failing pack does not lose the results of the others.
+    """
+    if not packs:
+        return []
+    outcomes = [None] * len(packs)
+    workers = max(1, min(max_workers, len(packs)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="validate-batch") as pool:
+        # Packs keep the request deadline by running in a copy of the caller's context
+        futures = [pool.submit(contextvars.copy_context().run, pack_fn, pack) for pack in packs]
+        for position, future in enumerate(futures):
+            try:
+                outcomes[position] = future.result()
+            except Exception as e:
+                logger.error(f"Batch pack {position + 1}/{len(packs)} failed: {str(e)}")
+                outcomes[position] = e
+    return outcomes
@@ -0,0 +1,152 @@
+"""Replay a labeled claim corpus through the model cascade and compare tier setups.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_cascade [--corpus benchmarks/data/labeled_claims.jsonl]
+
+Every claim is sent to /validate once per setup (default: full model only,
+rules + full, rules + light + full) with the response cache off. For each
+setup the report gives upstream calls, per-request latency, the tier that
+answered, accuracy against the corpus labels and agreement with the
+full-only run, so the saving can be weighed against what it costs. The
+corpus includes true statements that share words with the rule table's
+myths ("Hospitals use bleach to kill germs on surfaces."), so a rule tier
+that matches words rather than claims shows up as lost accuracy.
+
+The stub backends stand in for the models: the full-tier stub knows every
+label (the reference answer), the light-tier stub knows only a share of them
+(--light-known) and guesses the rest with varying confidence, like a smaller
+model would.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import time
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "data", "labeled_claims.jsonl")
+DEFAULT_SETUPS = ["full", "rules,full", "rules,light,full"]
+LIGHT_MODEL = "models/gemini-1.5-flash-8b"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def answer_of(output):
+    """The classification a /validate response gave (its first claim's)"""
+    claims = output.get("claims") or []
+    return claims[0].get("classification") if claims else output.get("classification")
+
+
+def replay(client, corpus, stubs):
+    rows = []
+    for item in corpus:
+        calls_before = sum(stub.calls for stub in stubs)
+        started = time.perf_counter()
+        response = client.post("/validate", json={"type": "text", "content": item["text"]})
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        output = response.get_json() or {}
+        rows.append({
+            "id": item["id"],
+            "status": response.status_code,
+            "tier": output.get("tier", "none"),
+            "answer": answer_of(output),
+            "label": item.get("label"),
+            "ms": elapsed_ms,
+            "calls": sum(stub.calls for stub in stubs) - calls_before,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSONL of {\"id\", \"text\", \"label\"}")
+    parser.add_argument("--setup", action="append", help="cascade tiers to compare, e.g. rules,full (repeatable)")
+    parser.add_argument("--rules-min-confidence", type=int, default=90)
+    parser.add_argument("--light-min-confidence", type=int, default=85)
+    parser.add_argument("--light-known", type=float, default=0.7, help="share of labels the light stub knows")
+    parser.add_argument("--full-latency-ms", type=int, default=250)
+    parser.add_argument("--light-latency-ms", type=int, default=80)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ["HEALTHGUARD_LLM_BACKEND"] = "stub"
+    os.environ["HEALTHGUARD_CACHE_ENABLED"] = "0"
+    os.environ["HEALTHGUARD_SCAN_RESULTS_ENABLED"] = "0"
+    os.environ.setdefault("HEALTHGUARD_UPSTREAM_RPM", "0")
+    # Hedged duplicates would count as extra upstream calls
+    os.environ["HEALTHGUARD_HEDGE_ENABLED"] = "0"
+    logging.disable(logging.WARNING)
+
+    import app as app_module
+    import llm
+    from cache import normalize_content
+    from cascade import Cascade
+    from llm_stub import StubBackend
+
+    corpus = load_corpus(args.corpus)
+    labels = {normalize_content(item["text"]): item["label"] for item in corpus if item.get("label")}
+    rng = random.Random(args.seed)
+    light_labels = {key: label for key, label in labels.items() if rng.random() < args.light_known}
+
+    results = {}
+    for setup in args.setup or DEFAULT_SETUPS:
+        full = StubBackend(latency_ms=args.full_latency_ms, jitter_ms=args.full_latency_ms // 4, seed=args.seed,
+                           answers=labels)
+        light = StubBackend(latency_ms=args.light_latency_ms, jitter_ms=args.light_latency_ms // 4, seed=args.seed,
+                            salt=LIGHT_MODEL, answers=light_labels)
+        llm.set_backend(full)
+        llm.set_backend(light, model=LIGHT_MODEL)
+        app_module.cascade = Cascade(
+            tiers=tuple(tier.strip() for tier in setup.split(",")),
+            rules_min_confidence=args.rules_min_confidence,
+            light_model=LIGHT_MODEL,
+            light_min_confidence=args.light_min_confidence,
+        )
+        results[setup] = replay(app_module.app.test_client(), corpus, [full, light])
+
+    baseline = next(iter(results.values()))
+    print(f"{len(corpus)} claims from {args.corpus}; agreement is with the '{next(iter(results))}' run\n")
+    print(f"{'setup':<20}{'calls':>7}{'model-free':>12}{'p50 ms':>9}{'p95 ms':>9}{'mean ms':>9}"
+          f"{'accuracy':>10}{'agreement':>11}  answered by")
+    for setup, rows in results.items():
+        latencies = [row["ms"] for row in rows]
+        labeled = [row for row in rows if row["label"]]
+        correct = sum(1 for row in labeled if row["answer"] == row["label"])
+        agree = sum(1 for row, base in zip(rows, baseline) if row["answer"] == base["answer"])
+        tiers = {}
+        for row in rows:
+            tiers[row["tier"]] = tiers.get(row["tier"], 0) + 1
+        model_free = sum(1 for row in rows if row["calls"] == 0)
+        print(f"{setup:<20}{sum(row['calls'] for row in rows):>7}{100 * model_free / len(rows):>11.1f}%"
+              f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 95):>9.1f}"
+              f"{sum(latencies) / len(latencies):>9.1f}{100 * correct / max(len(labeled), 1):>9.1f}%"
+              f"{100 * agree / len(rows):>10.1f}%  "
+              + ", ".join(f"{tier} {count}" for tier, count in sorted(tiers.items())))
+        errors = [row for row in rows if row["status"] != 200]
+        if errors:
+            print(f"{'':<20}{len(errors)} request(s) failed")
+
+    print("\nWrong answers by tier (vs labels):")
+    for setup, rows in results.items():
+        wrong = {}
+        for row in rows:
+            if row["label"] and row["answer"] != row["label"]:
+                wrong[row["tier"]] = wrong.get(row["tier"], 0) + 1
+        print(f"  {setup:<18}" + (", ".join(f"{tier} {count}" for tier, count in sorted(wrong.items())) or "none"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Measure how much page chrome the text cleaner removes before scanning.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_cleaner [--corpus benchmarks/data/saved_pages.jsonl ...]
+
+The default corpus is the innerText of saved pages (news, blog, shop and forum
+layouts) plus the scan-page samples used by the other benchmarks; pass
+--corpus with a JSONL of {"id", "text"} records to measure your own crawl.
+Token counts are scanner prompt tokens, estimated at ~4 characters per token,
+with the prefilter off and on.
+"""
+import argparse
+import json
+import os
+import time
+
+import config
+from app import PROMPT_TEMPLATE_SCANNER
+from batch import estimate_tokens
+from cleaner import clean_page_text
+from prefilter import extract_candidate_text
+from scanner import split_into_chunks
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+DEFAULT_CORPORA = [os.path.join(DATA_DIR, "saved_pages.jsonl"), os.path.join(DATA_DIR, "sample_pages.jsonl")]
+
+
+def load_pages(paths):
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                if item.get("kind", "page") == "page" and item.get("text"):
+                    pages.append(item)
+    return pages
+
+
+def prompt_tokens(text, use_prefilter):
+    if use_prefilter:
+        text = extract_candidate_text(text, config.PREFILTER_MIN_TERMS)
+    chunks = split_into_chunks(text, config.SCAN_CHUNK_CHARS)[:config.SCAN_MAX_CHUNKS]
+    return sum(estimate_tokens(PROMPT_TEMPLATE_SCANNER.format(text=chunk)) for chunk in chunks)
+
+
+def run(pages, repeat):
+    rows = []
+    for item in pages:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            cleaned = clean_page_text(item["text"], config.CLEAN_NAV_MAX_WORDS, config.CLEAN_NAV_MIN_RUN)
+        clean_ms = (time.perf_counter() - start) * 1000 / repeat
+        rows.append({
+            "id": item.get("id", "?"),
+            "chars_before": len(item["text"]),
+            "chars_after": len(cleaned.text),
+            "tokens_before": prompt_tokens(item["text"], use_prefilter=False),
+            "tokens_after": prompt_tokens(cleaned.text, use_prefilter=False),
+            "prefiltered_before": prompt_tokens(item["text"], use_prefilter=True),
+            "prefiltered_after": prompt_tokens(cleaned.text, use_prefilter=True),
+            "clean_ms": clean_ms,
+            "removed": cleaned.stats(),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", action="append", help="JSONL of pages (repeatable)")
+    parser.add_argument("--repeat", type=int, default=50, help="timing repetitions per page")
+    args = parser.parse_args()
+
+    rows = run(load_pages(args.corpus or DEFAULT_CORPORA), args.repeat)
+
+    print(f"{'page':<26}{'chars':>14}{'tokens':>14}{'w/ prefilter':>15}{'clean ms':>10}  removed lines")
+    for row in rows:
+        chars = f"{row['chars_before']}->{row['chars_after']}"
+        tokens = f"{row['tokens_before']}->{row['tokens_after']}"
+        prefiltered = f"{row['prefiltered_before']}->{row['prefiltered_after']}"
+        removed = row["removed"]
+        lines = (f"boiler {removed['boilerplate_lines']}, nav {removed['navigation_lines']}, "
+                 f"related {removed['related_lines']}, dup {removed['duplicates_removed']}")
+        print(f"{row['id']:<26}{chars:>14}{tokens:>14}{prefiltered:>15}{row['clean_ms']:>10.3f}  {lines}")
+
+    def total(key):
+        return sum(row[key] for row in rows)
+
+    print()
+    for label, before, after in (("Prompt tokens", "tokens_before", "tokens_after"),
+                                 ("With prefilter", "prefiltered_before", "prefiltered_after")):
+        saved = total(before) - total(after)
+        print(f"{label + ':':<20}{total(before)} -> {total(after)} "
+              f"({saved} saved, {100 * saved / max(total(before), 1):.1f}%)")
+    print(f"{'Cleaning cost:':<20}{total('clean_ms'):.2f} ms total over {len(rows)} pages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Load-test the HealthGuard endpoints at controlled concurrency.
+
+Run from the backend directory. By default the app is driven in-process with
+the deterministic stub LLM backend, so no API key or network is needed:
+
+    python -m benchmarks.bench_endpoints --concurrency 32 --requests 400
+
+Point it at a running server (started with HEALTHGUARD_LLM_BACKEND=stub for
+offline runs) to include the HTTP stack:
+
+    python -m benchmarks.bench_endpoints --url http://localhost:5000
+
+Reports throughput and p50/p95/p99 latency per endpoint.
+"""
+import argparse
+import itertools
+import json
+import logging
+import math
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "data", "sample_pages.jsonl")
+ENDPOINTS = ["/validate", "/doctor-mode", "/analyze-multiple", "/scan-page"]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def load_payloads(corpus_path, endpoints):
+    with open(corpus_path, encoding="utf-8") as f:
+        items = [json.loads(line) for line in f if line.strip()]
+    claims = [item["text"] for item in items if item["kind"] == "claim"]
+    pages = [item["text"] for item in items if item["kind"] == "page"]
+
+    payloads = []
+    for endpoint in endpoints:
+        if endpoint == "/scan-page":
+            payloads.extend((endpoint, {"text": page}) for page in pages)
+        else:
+            payloads.extend((endpoint, {"type": "text", "content": claim}) for claim in claims)
+    return payloads
+
+
+def make_unique(payload, counter):
+    """Append a request counter so the response cache cannot serve the request"""
+    payload = dict(payload)
+    if "text" in payload:
+        payload["text"] = f"{payload['text']}\nRequest {counter} adds vitamin D to the diet."
+    else:
+        payload["content"] = f"{payload['content']} (request {counter})"
+    return payload
+
+
+def in_process_sender():
+    from app import app
+
+    local = threading.local()
+
+    def send(endpoint, payload):
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        response = local.client.post(endpoint, json=payload)
+        return response.status_code
+
+    return send
+
+
+def http_sender(base_url):
+    def send(endpoint, payload):
+        request = urllib.request.Request(
+            base_url.rstrip("/") + endpoint,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    return send
+
+
+def run(send, payloads, total_requests, concurrency, unique):
+    schedule = itertools.islice(itertools.cycle(payloads), total_requests)
+    schedule_lock = threading.Lock()
+    counter = itertools.count()
+    results = []
+    results_lock = threading.Lock()
+
+    def worker():
+        while True:
+            with schedule_lock:
+                item = next(schedule, None)
+                number = next(counter)
+            if item is None:
+                return
+            endpoint, payload = item
+            if unique:
+                payload = make_unique(payload, number)
+            start = time.perf_counter()
+            try:
+                status = send(endpoint, payload)
+            except Exception:
+                status = 0
+            elapsed = time.perf_counter() - start
+            with results_lock:
+                results.append((endpoint, status, elapsed))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - started
+    return results, wall
+
+
+def report(results, wall, concurrency):
+    print(f"{'endpoint':<20}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    groups = {}
+    for endpoint, status, elapsed in results:
+        groups.setdefault(endpoint, []).append((status, elapsed))
+    groups["all"] = [(status, elapsed) for _, status, elapsed in results]
+    for endpoint, rows in groups.items():
+        latencies = [elapsed * 1000 for _, elapsed in rows]
+        errors = sum(1 for status, _ in rows if status != 200)
+        print(f"{endpoint:<20}{len(rows):>9}{errors:>8}{len(rows) / wall:>9.1f}"
+              f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 95):>9.1f}{percentile(latencies, 99):>9.1f}")
+    print(f"\n{len(results)} requests in {wall:.2f}s at concurrency {concurrency}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="base URL of a running server; omit to run in-process")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS, choices=ENDPOINTS)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--with-cache", action="store_true",
+                        help="keep the response cache on and repeat payloads verbatim")
+    parser.add_argument("--stub-latency-ms", type=int, default=200)
+    parser.add_argument("--stub-jitter-ms", type=int, default=50)
+    parser.add_argument("--stub-slow-rate", type=float, default=0.0)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--stub-malformed-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.url:
+        send = http_sender(args.url)
+    else:
+        # Settings are read at import time, so configure the stub before importing the app
+        os.environ["HEALTHGUARD_LLM_BACKEND"] = "stub"
+        os.environ["HEALTHGUARD_STUB_LATENCY_MS"] = str(args.stub_latency_ms)
+        os.environ["HEALTHGUARD_STUB_JITTER_MS"] = str(args.stub_jitter_ms)
+        os.environ["HEALTHGUARD_STUB_SLOW_RATE"] = str(args.stub_slow_rate)
+        os.environ["HEALTHGUARD_STUB_ERROR_RATE"] = str(args.stub_error_rate)
+        os.environ["HEALTHGUARD_STUB_MALFORMED_RATE"] = str(args.stub_malformed_rate)
+        if not args.with_cache:
+            os.environ["HEALTHGUARD_CACHE_ENABLED"] = "0"
+        os.environ.setdefault("HEALTHGUARD_MAX_UPSTREAM_CONCURRENCY", str(max(args.concurrency, 16)))
+        # Measure the app, not the quota limiter
+        os.environ.setdefault("HEALTHGUARD_UPSTREAM_RPM", "0")
+        logging.disable(logging.CRITICAL)
+        send = in_process_sender()
+
+    payloads = load_payloads(args.corpus, args.endpoints)
+    results, wall = run(send, payloads, args.requests, args.concurrency, unique=not args.with_cache)
+    report(results, wall, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
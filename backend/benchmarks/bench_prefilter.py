@@ -0,0 +1,114 @@
+"""Measure what the local health prefilter saves before any Gemini call is made.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_prefilter [--corpus benchmarks/data/sample_pages.jsonl]
+
+Token counts are estimated at ~4 characters per token. Upstream latency saved
+is estimated from the per-call and per-1k-token costs given on the command line.
+
+Claim items carry a "health" label, so the report also gives the prefilter's
+recall: how many health claims it would have rejected as off-topic. /validate
+and /validate-batch send such claims to the model anyway; /analyze-multiple
+does not.
+"""
+import argparse
+import json
+import os
+import time
+
+import config
+from app import PROMPT_TEMPLATE, PROMPT_TEMPLATE_SCANNER
+from batch import estimate_tokens
+from prefilter import is_health_related, extract_candidate_text
+from scanner import split_into_chunks
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "data", "sample_pages.jsonl")
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def claim_prompts(text, use_prefilter):
+    if use_prefilter and not is_health_related(text, config.PREFILTER_MIN_TERMS):
+        return []
+    return [PROMPT_TEMPLATE.format(type="text", content=text[:2000])]
+
+
+def page_prompts(text, use_prefilter):
+    if use_prefilter:
+        text = extract_candidate_text(text, config.PREFILTER_MIN_TERMS)
+    chunks = split_into_chunks(text, config.SCAN_CHUNK_CHARS)[:config.SCAN_MAX_CHUNKS]
+    return [PROMPT_TEMPLATE_SCANNER.format(text=chunk) for chunk in chunks]
+
+
+def run(corpus, repeat):
+    rows = []
+    totals = {"calls_before": 0, "calls_after": 0, "tokens_before": 0, "tokens_after": 0, "prefilter_ms": 0.0}
+    for item in corpus:
+        build = claim_prompts if item["kind"] == "claim" else page_prompts
+        before = build(item["text"], use_prefilter=False)
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            after = build(item["text"], use_prefilter=True)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / repeat
+
+        row = {
+            "id": item["id"],
+            "calls_before": len(before),
+            "calls_after": len(after),
+            "tokens_before": sum(estimate_tokens(p) for p in before),
+            "tokens_after": sum(estimate_tokens(p) for p in after),
+            "prefilter_ms": elapsed_ms,
+        }
+        rows.append(row)
+        for key in totals:
+            totals[key] += row[key]
+    return rows, totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=50, help="timing repetitions per item")
+    parser.add_argument("--upstream-ms-per-call", type=float, default=800.0,
+                        help="assumed fixed Gemini round-trip cost per call")
+    parser.add_argument("--upstream-ms-per-1k-tokens", type=float, default=150.0,
+                        help="assumed extra Gemini latency per 1k input tokens")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    rows, totals = run(corpus, args.repeat)
+
+    print(f"{'item':<22}{'calls':>10}{'tokens before':>16}{'tokens after':>15}{'prefilter ms':>15}")
+    for row in rows:
+        calls = f"{row['calls_before']}->{row['calls_after']}"
+        print(f"{row['id']:<22}{calls:>10}{row['tokens_before']:>16}{row['tokens_after']:>15}{row['prefilter_ms']:>15.3f}")
+
+    tokens_saved = totals["tokens_before"] - totals["tokens_after"]
+    calls_saved = totals["calls_before"] - totals["calls_after"]
+    upstream_saved_ms = (calls_saved * args.upstream_ms_per_call
+                         + tokens_saved / 1000 * args.upstream_ms_per_1k_tokens)
+    print()
+    print(f"Upstream calls:     {totals['calls_before']} -> {totals['calls_after']} ({calls_saved} avoided)")
+    print(f"Input tokens:       {totals['tokens_before']} -> {totals['tokens_after']} "
+          f"({tokens_saved} saved, {100 * tokens_saved / max(totals['tokens_before'], 1):.1f}%)")
+    print(f"Prefilter cost:     {totals['prefilter_ms']:.2f} ms total")
+    print(f"Est. latency saved: {upstream_saved_ms:.0f} ms total "
+          f"(net {upstream_saved_ms - totals['prefilter_ms']:.0f} ms)")
+
+    health = [item for item in corpus if item["kind"] == "claim" and item.get("health")]
+    other = [item for item in corpus if item["kind"] == "claim" and item.get("health") is False]
+    false_rejects = [item for item in health if not is_health_related(item["text"], config.PREFILTER_MIN_TERMS)]
+    true_rejects = [item for item in other if not is_health_related(item["text"], config.PREFILTER_MIN_TERMS)]
+    missed = ", ".join(item["id"] for item in false_rejects) or "none"
+    print(f"Recall:             {len(health) - len(false_rejects)}/{len(health)} health claims kept "
+          f"(false rejects: {missed})")
+    print(f"Off-topic rejected: {len(true_rejects)}/{len(other)} non-health claims")
+
+
+if __name__ == "__main__":
+    main()
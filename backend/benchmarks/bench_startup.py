@@ -0,0 +1,130 @@
+"""Measure cold-start time to first response for each endpoint.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_startup [--repeat 3] [--warmup]
+
+Every sample starts a fresh Python process (as a scale-to-zero container
+would), imports the app and sends one request to one endpoint, then a second
+one to show the warm cost. Reported per endpoint, as medians: app import
+time, first and second request time, and time to first response counted
+from process spawn. The stub backend answers with no latency so only
+startup work is measured. --warmup runs the warm-up hook after the import,
+as HEALTHGUARD_WARMUP_ON_START=1 does, to show what it moves off the first
+request. The google.generativeai import time is measured separately, since
+a Gemini-backed process pays it on its first model call (or at warm-up)
+rather than at startup.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# 1x1 PNG
+TINY_PNG = ("data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAA"
+            "AABJRU5ErkJggg==")
+
+CASES = {
+    "health": ("GET", "/health", None),
+    "validate": ("POST", "/validate", {"type": "text", "content": "Drinking green tea burns belly fat overnight."}),
+    "validate-image": ("POST", "/validate", {"type": "image_text",
+                                             "content": {"text": "Is this post right?", "image_base64": TINY_PNG}}),
+    "analyze-multiple": ("POST", "/analyze-multiple",
+                         {"type": "text", "content": "Garlic lowers blood pressure. Honey cures coughs."}),
+    "doctor-mode": ("POST", "/doctor-mode", {"type": "text", "content": "What causes migraines?"}),
+    "scan-page": ("POST", "/scan-page", {"text": "Intermittent fasting resets your immune system. "
+                                                 "Cold showers double your metabolism."}),
+    "validate-batch": ("POST", "/validate-batch", {"claims": ["Turmeric cures arthritis.", "Coffee dehydrates you."]}),
+}
+
+
+def child(case, warmup):
+    """Runs in the fresh process: import, optionally warm up, then time two requests"""
+    started = time.perf_counter()
+    if case == "genai":
+        import google.generativeai  # noqa: F401
+        print(json.dumps({"import_ms": (time.perf_counter() - started) * 1000}))
+        return
+    import logging
+    logging.disable(logging.WARNING)
+    from app import app, warm_up
+    imported = time.perf_counter()
+    if warmup:
+        warm_up()
+    warmed = time.perf_counter()
+
+    method, path, payload = CASES[case]
+    client = app.test_client()
+    timings = []
+    for _ in range(2):
+        request_started = time.perf_counter()
+        response = client.open(path, method=method, json=payload)
+        timings.append((time.perf_counter() - request_started) * 1000)
+        if response.status_code != 200:
+            raise SystemExit(f"{case}: HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    spawned_at = float(os.environ["HEALTHGUARD_BENCH_SPAWNED_AT"])
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "warmup_ms": (warmed - imported) * 1000,
+        "first_ms": timings[0],
+        "second_ms": timings[1],
+        "to_first_response_ms": (time.time() - spawned_at) * 1000,
+    }))
+
+
+def sample(case, warmup, tmp):
+    env = dict(os.environ)
+    env.update({
+        "HEALTHGUARD_LLM_BACKEND": "stub",
+        "HEALTHGUARD_STUB_LATENCY_MS": "0",
+        "HEALTHGUARD_STUB_JITTER_MS": "0",
+        "HEALTHGUARD_CACHE_ENABLED": "0",
+        "HEALTHGUARD_SCAN_RESULTS_DB_PATH": os.path.join(tmp, f"scan_results_{case}.db"),
+        "HEALTHGUARD_BENCH_SPAWNED_AT": repr(time.time()),
+        "PYTHONWARNINGS": "ignore",
+    })
+    command = [sys.executable, "-m", "benchmarks.bench_startup", "--child", case] + (["--warmup"] if warmup else [])
+    result = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def median(samples, key):
+    return statistics.median(s[key] for s in samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="fresh processes per endpoint")
+    parser.add_argument("--endpoint", action="append", choices=sorted(CASES), help="endpoints to measure")
+    parser.add_argument("--warmup", action="store_true", help="run the warm-up hook before the first request")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.warmup)
+        return
+
+    print(f"Medians of {args.repeat} fresh processes per endpoint, warm-up {'on' if args.warmup else 'off'}\n")
+    print(f"{'endpoint':<18}{'import ms':>11}{'warm-up ms':>12}{'1st req ms':>12}{'2nd req ms':>12}"
+          f"{'to 1st response':>17}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for case in args.endpoint or list(CASES):
+            samples = [sample(case, args.warmup, tmp) for _ in range(args.repeat)]
+            print(f"{case:<18}{median(samples, 'import_ms'):>11.1f}{median(samples, 'warmup_ms'):>12.1f}"
+                  f"{median(samples, 'first_ms'):>12.1f}{median(samples, 'second_ms'):>12.1f}"
+                  f"{median(samples, 'to_first_response_ms'):>14.1f} ms")
+        try:
+            genai = [sample("genai", False, tmp) for _ in range(args.repeat)]
+        except subprocess.CalledProcessError:
+            print("\ngoogle.generativeai is not installed; its import time was not measured")
+        else:
+            print(f"\nimport google.generativeai: {median(genai, 'import_ms'):.1f} ms "
+                  "(paid on the first Gemini call, or during warm-up)")
+
+
+if __name__ == "__main__":
+    main()
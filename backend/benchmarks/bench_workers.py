@@ -0,0 +1,144 @@
+"""Measure how throughput scales with the number of pre-fork workers.
+
+Run from the backend directory (needs gunicorn):
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --requests 400
+
+For each worker count a gunicorn server is started from gunicorn.conf.py with
+the stub LLM backend and a fresh shared cache file, then loaded with unique
+/scan-page and /validate requests so every request does the full parse,
+clean and prompt-building work. A second pass re-sends /validate claims the
+server has already answered and counts cache hits: with the shared SQLite
+cache they hit whichever worker cached them.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_endpoints import DEFAULT_CORPUS, http_sender, load_payloads, percentile, run
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(workers, port, tmp, args):
+    db_path = os.path.join(tmp, "shared.db")
+    env = dict(
+        os.environ,
+        HEALTHGUARD_WORKERS=str(workers),
+        HEALTHGUARD_THREADS=str(args.threads),
+        HEALTHGUARD_BIND=f"127.0.0.1:{port}",
+        HEALTHGUARD_SHARED_DB_PATH=db_path,
+        HEALTHGUARD_SCAN_RESULTS_DB_PATH=db_path,
+        HEALTHGUARD_LLM_BACKEND="stub",
+        HEALTHGUARD_STUB_LATENCY_MS=str(args.stub_latency_ms),
+        HEALTHGUARD_STUB_JITTER_MS="0",
+        # Measure the app, not the quota limiter
+        HEALTHGUARD_UPSTREAM_RPM="0",
+        HEALTHGUARD_MAX_UPSTREAM_CONCURRENCY=str(max(64, workers * args.threads)),
+    )
+    for name in ("HEALTHGUARD_CACHE_DB_PATH", "HEALTHGUARD_VERDICT_DB_PATH", "HEALTHGUARD_PAGE_STORE_DB_PATH"):
+        env.pop(name, None)
+    # The app logs every request; keep that out of the report
+    log = open(os.path.join(tmp, "server.log"), "wb")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning", "wsgi:application"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    log.close()
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + "/health", timeout=2) as response:
+                if response.status == 200:
+                    return process, base_url
+        except OSError:
+            # Refused, or accepted but not answered while the workers import the app
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"gunicorn with {workers} workers did not come up; see {log.name}")
+
+
+def worker_pids(base_url, probes=64, concurrency=16):
+    """Worker processes that answered concurrent /health probes"""
+    def probe(_):
+        with urllib.request.urlopen(base_url + "/health", timeout=60) as response:
+            return json.loads(response.read())["worker"]["pid"]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return set(pool.map(probe, range(probes)))
+
+
+def shared_cache_hits(base_url, claims):
+    """Send each claim twice; return how many second sends were cache hits"""
+    def post(claim):
+        request = urllib.request.Request(
+            base_url + "/validate",
+            data=json.dumps({"type": "text", "content": claim}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+            return response.headers.get("X-Cache")
+
+    for claim in claims:
+        post(claim)
+    return sum(1 for claim in claims if post(claim) == "HIT")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=8, help="request threads per worker")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--stub-latency-ms", type=int, default=0)
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.corpus, ["/scan-page", "/validate"])
+    # Only health claims reach the model (and the cache); the prefilter answers the rest directly
+    with open(args.corpus, encoding="utf-8") as f:
+        items = [json.loads(line) for line in f if line.strip()]
+    claims = [f"{item['text']} (cache probe {n})"
+              for n, item in enumerate(items) if item["id"].startswith("claim-health")]
+    print(f"{os.cpu_count()} CPUs, {args.threads} threads per worker, stub latency {args.stub_latency_ms} ms\n")
+    print(f"{'workers':>8}{'pids seen':>10}{'req/s':>9}{'speedup':>9}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}"
+          f"{'shared hits':>13}")
+    baseline = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            process, base_url = start_server(workers, args.port, tmp, args)
+            try:
+                # Don't time a server whose later workers are still importing the app
+                pids = worker_pids(base_url)
+                deadline = time.monotonic() + 60
+                while len(pids) < workers and time.monotonic() < deadline:
+                    time.sleep(1)
+                    pids |= worker_pids(base_url)
+                # Warm every worker's imports and connections before timing
+                run(http_sender(base_url), payloads, workers * args.threads, args.concurrency, unique=True)
+                results, wall = run(http_sender(base_url), payloads, args.requests, args.concurrency, unique=True)
+                hits = shared_cache_hits(base_url, claims)
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+        throughput = len(results) / wall
+        baseline = baseline or throughput
+        latencies = [elapsed * 1000 for _, _, elapsed in results]
+        errors = sum(1 for _, status, _ in results if status != 200)
+        print(f"{workers:>8}{len(pids):>10}{throughput:>9.1f}{throughput / baseline:>8.2f}x"
+              f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 95):>9.1f}{errors:>8}"
+              f"{f'{hits}/{len(claims)}':>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_content(text):
+    """Normalize user content so trivially different submissions share a cache entry"""
+    if not text:
+        return ""
+    return _WHITESPACE_RE.sub(" ", text).strip().casefold()
+
+
+def template_version(template):
+    """Short fingerprint of a prompt template; editing the template invalidates old entries"""
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:12]
+
+
+def hash_bytes(data):
+    """Content hash for binary payloads such as decoded images"""
+    if not data:
+        return ""
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_cache_key(endpoint, version, content, image_hash=""):
+    """Build a content-addressed key from (endpoint, template version, content, image hash)"""
+    raw = json.dumps([endpoint, version, normalize_content(content), image_hash or ""])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with TTL and optional SQLite persistence.
+
+    Entries live in an in-memory OrderedDict. When ``db_path`` is given every
+    write also goes to SQLite, and memory misses fall back to the database so
+    cached responses survive restarts and are shared by every process using
+    the same file.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=6 * 60 * 60, db_path=None, table="response_cache",
+                 stale_seconds=0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Expired entries are kept this much longer for get_stale()
+        self.stale_seconds = stale_seconds
+        self.stale_hits = 0
+        self.db_path = db_path or None
+        self.table = table
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._writes = 0
+        if self.db_path:
+            self._open_db()
+
+    def _open_db(self):
+        # WAL lets pre-fork workers sharing the file read while another one writes
+        self._db = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_stored_at ON {self.table} (stored_at)"
+        )
+        self._db.commit()
+        logger.info(f"Cache table {self.table} persisted to {self.db_path}")
+
+    def _expired(self, stored_at, now):
+        return self.ttl_seconds > 0 and now - stored_at > self.ttl_seconds
+
+    def get(self, key):
+        """Return the cached value for ``key`` or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if not self._expired(stored_at, now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if not self.stale_seconds:
+                    del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[1], now):
+                    value = json.loads(row[0])
+                    self._store_memory(key, value, row[1])
+                    self.hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def get_stale(self, key):
+        """Return the value for ``key`` even if it expired less than ``stale_seconds`` ago, else None"""
+        if self.ttl_seconds <= 0 or not self.stale_seconds:
+            return self.get(key)
+        oldest = time.time() - self.ttl_seconds - self.stale_seconds
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+                entry = (row[1], json.loads(row[0])) if row is not None else None
+            if entry is None or entry[0] < oldest:
+                return None
+            self.stale_hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        """Store a JSON-serializable value under ``key``"""
+        now = time.time()
+        with self._lock:
+            self._store_memory(key, value, now)
+            if self._db is not None:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), now),
+                )
+                self._writes += 1
+                if self._writes % 64 == 0:
+                    self._prune_db(now)
+                self._db.commit()
+
+    def _store_memory(self, key, value, stored_at):
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _prune_db(self, now):
+        if self.ttl_seconds > 0:
+            self._db.execute(
+                f"DELETE FROM {self.table} WHERE stored_at < ?", (now - self.ttl_seconds - self.stale_seconds,)
+            )
+        self._db.execute(
+            f"DELETE FROM {self.table} WHERE key NOT IN ("
+            f"SELECT key FROM {self.table} ORDER BY stored_at DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute(f"DELETE FROM {self.table}")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "persistent": self._db is not None,
+            }
@@ -0,0 +1,320 @@
+import logging
+import re
+import threading
+
+from prefilter import health_terms, split_sentences
+
+logger = logging.getLogger(__name__)
+
+# Confidence-based model cascade.
+#
+# Claims are answered by the cheapest tier that is sure enough: a local rule
+# table of well-established claims, then (optionally) a smaller configured
+# model, then the full model. A tier's answer is only kept when its
+# confidence_score (0-100, as the prompts ask the model for) reaches that
+# tier's threshold; everything else goes on to the next tier.
+
+RULES = "rules"
+LIGHT = "light"
+FULL = "full"
+TIERS = (RULES, LIGHT, FULL)
+
+# Conditions a remedy claim can name as its object
+_CONDITIONS = ("cancer*|tumo*|diabet*|asthma|allerg*|arthrit*|autism|autistic|adhd|depress*|anxiety|eczema|"
+               "migraine*|insomnia|infection*|disease*|illness*|covid*|coronavirus|flu|cold|colds|malaria|hiv|aids")
+
+# Well-established claims the rule tier answers without a model call.
+# (rule id, slots, classification, confidence, explanation, correct information, source ids)
+#
+# Slots are term groups that must appear in order, subject first: the first
+# slot starts the sentence (after up to MAX_LEAD_WORDS words from LEAD_WORDS,
+# e.g. "the", "drinking"), and each following slot starts within
+# MAX_SLOT_GAP words of the previous one with no clause break in between. So
+# "Antibiotics cure colds" matches antibiotics-virus, while "Hospitals use
+# bleach to kill germs" or "Antibiotics treat pneumonia that follows a cold"
+# do not. "|" separates alternatives; a term ending in "*" is a word prefix,
+# a term with a space is a phrase, anything else a whole word.
+RULE_TABLE = [
+    ("vaccines-autism",
+     ("vaccin*|mmr|jab|jabs", "cause*|lead*|trigger*|link*|result*|give*", "autism|autistic"), "Misleading", 97,
+     "Large studies of millions of children have found no link between vaccines and autism.",
+     "Vaccines do not cause autism; the study that claimed a link was retracted for fraud.", ("CDC", "WHO", "NIH")),
+    ("5g-covid",
+     ("5g", "cause*|spread*|transmit*|trigger*|link*|responsible", "covid*|coronavirus"), "Misleading", 97,
+     "Viruses cannot travel on radio waves or mobile networks.",
+     "COVID-19 is caused by the SARS-CoV-2 virus and spreads between people, not through 5G networks.", ("WHO",)),
+    ("bleach-cure",
+     ("bleach|chlorine dioxide|mms|miracle mineral*", "cure*|treat*|heal*", _CONDITIONS), "Misleading", 98,
+     "Bleach and chlorine dioxide are poisons; drinking them causes serious harm and cures nothing.",
+     "Never drink bleach or chlorine dioxide products.", ("FDA", "CDC")),
+    ("home-remedy-cancer",
+     ("baking soda|lemon*|garlic|turmeric|apple cider vinegar|alkaline*", "cure*", "cancer*"), "Misleading", 94,
+     "No food or home remedy has been shown to cure cancer.",
+     "Cancer is treated with evidence-based therapies such as surgery, chemotherapy and radiotherapy.",
+     ("NIH", "MAYO")),
+    ("homeopathy-cure",
+     ("homeopath*", "cure*|treat*|heal*", _CONDITIONS), "Misleading", 92,
+     "Systematic reviews find homeopathic remedies work no better than placebo.",
+     "There is no reliable evidence that homeopathy is effective for any health condition.", ("NHS", "NIH")),
+    ("ivermectin-covid",
+     ("ivermectin", "cure*|treat*|prevent*|work*|kill*|effective", "covid*|coronavirus"), "Misleading", 93,
+     "Large randomized trials found ivermectin does not improve COVID-19 outcomes.",
+     "Ivermectin is not recommended for treating or preventing COVID-19.", ("FDA", "WHO")),
+    ("hcq-covid",
+     ("hydroxychloroquine", "cure*|treat*|prevent*|work*|kill*|effective", "covid*|coronavirus"), "Misleading", 93,
+     "Randomized trials found hydroxychloroquine does not help patients with COVID-19.",
+     "Hydroxychloroquine is not an effective COVID-19 treatment.", ("FDA", "WHO")),
+    ("antibiotics-virus",
+     ("antibiotic*", "cure*|treat*|kill*|fight*|help*|work*|effective",
+      "virus*|viral|flu|cold|colds|influenza|covid*"), "Misleading", 93,
+     "Antibiotics act on bacteria and have no effect on viruses such as colds and flu.",
+     "Colds and flu are viral; antibiotics do not treat them and overuse drives resistance.", ("CDC", "NHS")),
+    ("vitamin-c-cold",
+     ("vitamin c", "cure*|prevent*", "cold|colds"), "Misleading", 90,
+     "Regular vitamin C may slightly shorten colds but does not prevent or cure them.",
+     "Vitamin C does not cure or reliably prevent the common cold.", ("NIH", "MAYO")),
+    ("flu-shot-flu",
+     ("flu shot*|flu jab*|flu vaccin*|influenza vaccin*", "give*|gave|cause*", "flu|influenza"), "Misleading", 92,
+     "Injected flu vaccines contain inactivated virus or a single protein and cannot cause influenza.",
+     "The flu shot cannot give you the flu; mild soreness or a low fever can follow vaccination.", ("CDC",)),
+    ("brain-ten-percent",
+     ("we|humans|people|you", "use|uses|using", "10%|10 percent|ten percent", "brain*"), "Misleading", 95,
+     "Brain imaging shows activity throughout the brain; no large part sits unused.",
+     "People use virtually all of their brain.", ("HARVARD",)),
+    ("knuckles-arthritis",
+     ("crack* knuckle*|crack* your knuckles|knuckle crack*", "cause*|lead*|give*", "arthrit*"), "Misleading", 92,
+     "Studies comparing habitual knuckle crackers with others found no higher rate of arthritis.",
+     "Cracking knuckles has not been shown to cause arthritis.", ("HARVARD", "HOPKINS")),
+    ("shaving-thicker",
+     ("shav*", "grow*|regrow*", "thicker|darker|faster|coarser"), "Misleading", 92,
+     "Shaving cuts hair at the surface and does not change its thickness, colour or growth rate.",
+     "Hair that regrows after shaving is not thicker or darker.", ("MAYO",)),
+    ("sugar-hyperactivity",
+     ("sugar*", "cause*|make*|lead*|trigger*", "hyperactiv*"), "Misleading", 88,
+     "Controlled trials have not found that sugar makes children hyperactive.",
+     "Sugar does not cause hyperactivity, though limiting added sugar is still advised.", ("HARVARD",)),
+    ("detox-toxins",
+     ("detox*|cleanse*|juice cleanse*", "remove*|flush*|eliminate*|clear*|purge*|draw*|pull*|rid*", "toxin*"),
+     "Misleading", 86,
+     "The liver and kidneys remove waste; detox products have no proven added effect.",
+     "Detox teas and cleanses are not needed to remove toxins.", ("NIH", "MAYO")),
+    ("smoking-lung-cancer",
+     ("smok*|cigarette*|tobacco", "cause*|increase*|raise*|lead*|linked|link*", "lung cancer*"), "Accurate", 97,
+     "Smoking is the leading cause of lung cancer.",
+     "Smoking causes most lung cancers; quitting at any age lowers the risk.", ("CDC", "WHO")),
+    ("handwashing-infection",
+     ("wash* hands|wash* your hands|handwashing|hand washing", "prevent*|reduce*|stop*|lower*|cut*",
+      "infect*|germ*|spread*|illness*|disease*"), "Accurate", 94,
+     "Washing hands with soap removes germs and cuts the spread of many infections.",
+     "Regular handwashing with soap and water helps prevent infections.", ("CDC", "WHO")),
+    ("sunscreen-skin-cancer",
+     ("sunscreen*", "reduce*|lower*|prevent*|protect*|cut*", "skin cancer*|melanoma*"), "Accurate", 92,
+     "Regular sunscreen use lowers the risk of skin cancers, including melanoma.",
+     "Broad-spectrum sunscreen helps protect against skin cancer.", ("CDC", "MAYO")),
+    ("folic-acid-neural-tube",
+     ("folic acid|folate", "prevent*|reduce*|lower*|protect*|cut*", "neural tube|spina bifida"), "Accurate", 95,
+     "Folic acid before and early in pregnancy lowers the risk of neural tube defects.",
+     "Taking folic acid before and during early pregnancy helps prevent neural tube defects.", ("CDC", "NHS")),
+    ("exercise-heart",
+     ("exercis*|physical activity", "reduce*|lower*|prevent*|protect*|cut*",
+      "heart disease*|cardiovascular|heart attack*|blood pressure"), "Accurate", 91,
+     "Regular physical activity lowers blood pressure and the risk of heart disease.",
+     "Regular exercise helps prevent heart disease.", ("WHO", "NIH")),
+    ("measles-vaccine",
+     ("measles vaccin*|mmr", "prevent*|protect*|effective|stop*", "measles"), "Accurate", 93,
+     "Two doses of MMR vaccine are about 97% effective at preventing measles.",
+     "The MMR vaccine protects against measles.", ("CDC", "WHO")),
+]
+
+# Words that may reverse a rule's meaning; such sentences are left to the models
+NEGATIONS = frozenset(
+    "not no never none nor without cannot can't don't doesn't didn't isn't aren't wasn't weren't won't "
+    "myth myths false debunked".split()
+)
+
+# Words allowed before a rule's subject ("The flu shot ...", "Drinking bleach ...")
+LEAD_WORDS = frozenset(
+    "the a an some regular regularly daily getting taking drinking eating using having cracking your our my "
+    "all most many these this those".split()
+)
+MAX_LEAD_WORDS = 3
+
+# Slots must follow each other within this many words, and never across a clause break
+MAX_SLOT_GAP = 4
+CLAUSE_BREAKS = frozenset(
+    "that which who whom whose when where after before because but while if although though since unless "
+    "and or than follows followed following".split()
+)
+
+# Longer sentences may carry claims the rule did not look at
+MAX_RULE_WORDS = 30
+
+_WORD_RE = re.compile(r"[a-z0-9%]+(?:'[a-z]+)?")
+
+
+def _compile_slot(group):
+    """A slot's alternatives as tuples of (word, is_prefix) per token"""
+    return [
+        tuple((word[:-1], True) if word.endswith("*") else (word, False) for word in term.split())
+        for term in group.split("|")
+    ]
+
+
+def _slot_end(slot, tokens, start):
+    """Index after the longest alternative of ``slot`` matching at ``start``, or None"""
+    best = None
+    for alternative in slot:
+        end = start + len(alternative)
+        if end > len(tokens):
+            continue
+        if all(tokens[start + i].startswith(word) if prefix else tokens[start + i] == word
+               for i, (word, prefix) in enumerate(alternative)):
+            best = end if best is None else max(best, end)
+    return best
+
+
+def _slots_follow(slots, tokens, position):
+    """True if ``slots`` match in order from ``position``, each within MAX_SLOT_GAP words of the last"""
+    if not slots:
+        return True
+    for start in range(position, min(position + MAX_SLOT_GAP, len(tokens)) + 1):
+        if start > position and tokens[start - 1] in CLAUSE_BREAKS:
+            return False
+        end = _slot_end(slots[0], tokens, start)
+        if end is not None and _slots_follow(slots[1:], tokens, end):
+            return True
+    return False
+
+
+def _rule_matches(slots, tokens):
+    for start in range(min(MAX_LEAD_WORDS, len(tokens) - 1) + 1):
+        if start and tokens[start - 1] not in LEAD_WORDS:
+            return False
+        end = _slot_end(slots[0], tokens, start)
+        if end is not None and _slots_follow(slots[1:], tokens, end):
+            return True
+    return False
+
+
+def score_of(claim):
+    """A claim's confidence_score as a number (0 when missing or unreadable)"""
+    try:
+        return float(claim.get("confidence_score") or 0)
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
+
+
+class RuleClassifier:
+    """Answers well-established health claims from RULE_TABLE without a model call"""
+
+    def __init__(self, rules=RULE_TABLE):
+        self.rules = [
+            (rule_id, [_compile_slot(group) for group in groups], classification, confidence, explanation,
+             correct, sources)
+            for rule_id, groups, classification, confidence, explanation, correct, sources in rules
+        ]
+
+    def classify(self, sentence):
+        """Return (claim, source ids) for a sentence a rule covers, else (None, ())"""
+        stripped = sentence.strip()
+        if not stripped or stripped.endswith("?"):
+            return None, ()
+        tokens = _WORD_RE.findall(stripped.lower().replace("’", "'"))
+        if not tokens or len(tokens) > MAX_RULE_WORDS or NEGATIONS.intersection(tokens):
+            return None, ()
+        for rule_id, slots, classification, confidence, explanation, correct, sources in self.rules:
+            if _rule_matches(slots, tokens):
+                return {
+                    "claim_text": stripped,
+                    "classification": classification,
+                    "confidence_score": confidence,
+                    "explanation": explanation,
+                    "correct_information": correct,
+                    "rule": rule_id,
+                }, sources
+        return None, ()
+
+
+class Cascade:
+    """The configured tiers, their thresholds and how many answers each gave.
+
+    ``tiers`` lists tier names in order; the full model always ends the list.
+    The light tier needs ``light_model`` and is dropped without one.
+    """
+
+    def __init__(self, tiers=(FULL,), rules_min_confidence=90, light_model="", light_min_confidence=85,
+                 rules=None):
+        ordered = []
+        for tier in tiers:
+            if tier not in TIERS:
+                raise ValueError(f"Unknown cascade tier: {tier}")
+            if tier == LIGHT and not light_model:
+                logger.warning("Cascade tier \"light\" needs a light model name; skipping it")
+                continue
+            if tier not in ordered and tier != FULL:
+                ordered.append(tier)
+        self.tiers = tuple(ordered) + (FULL,)
+        self.rules_min_confidence = rules_min_confidence
+        self.light_model = light_model
+        self.light_min_confidence = light_min_confidence
+        self.rules = rules or RuleClassifier()
+        self._answers = {}
+        self._escalated = {}
+        self._lock = threading.Lock()
+
+    def uses(self, tier):
+        return tier in self.tiers
+
+    def answer_claim(self, claim_text):
+        """Rule-tier answer for one claim: (claim, source ids), or (None, ()) to escalate"""
+        if not self.uses(RULES):
+            return None, ()
+        claim, sources = self.rules.classify(claim_text)
+        if claim is None or score_of(claim) < self.rules_min_confidence:
+            return None, ()
+        return claim, sources
+
+    def answer_text(self, text):
+        """Rule-tier answers for free text: (claims, source ids) when every health
+        sentence in it is covered confidently, else (None, ())"""
+        if not self.uses(RULES):
+            return None, ()
+        claims, sources = [], []
+        for sentence in split_sentences(text):
+            if not health_terms(sentence):
+                continue
+            claim, claim_sources = self.answer_claim(sentence)
+            if claim is None:
+                return None, ()
+            claims.append(claim)
+            sources.extend(source for source in claim_sources if source not in sources)
+        return (claims, sources) if claims else (None, ())
+
+    def light_confident(self, claims):
+        """True when the light model answered with claims that all reach its threshold"""
+        return bool(claims) and all(score_of(claim) >= self.light_min_confidence for claim in claims)
+
+    def record(self, endpoint, tier, count=1):
+        """Count answers ``tier`` gave for ``endpoint`` (requests, or claims for batch endpoints)"""
+        with self._lock:
+            counts = self._answers.setdefault(endpoint, {})
+            counts[tier] = counts.get(tier, 0) + count
+
+    def escalate(self, endpoint, tier, count=1):
+        """Count answers ``tier`` was not sure enough of and passed on"""
+        with self._lock:
+            counts = self._escalated.setdefault(endpoint, {})
+            counts[tier] = counts.get(tier, 0) + count
+
+    def stats(self):
+        with self._lock:
+            answers = {endpoint: dict(counts) for endpoint, counts in self._answers.items()}
+            escalated = {endpoint: dict(counts) for endpoint, counts in self._escalated.items()}
+        return {
+            "tiers": list(self.tiers),
+            "rules_min_confidence": self.rules_min_confidence,
+            "light_model": self.light_model if self.uses(LIGHT) else None,
+            "light_min_confidence": self.light_min_confidence,
+            "answers": answers,
+            "escalated": escalated,
+        }
@@ -0,0 +1,212 @@
+import re
+
+from cache import normalize_content
+from prefilter import health_terms
+
+# Page text cleaning before the scanner prompt.
+#
+# document.body.innerText carries the whole page chrome: menus, cookie
+# banners, share bars, "related articles" lists and footers, often repeated.
+# Lines are classified with a few cheap heuristics and repeated lines and
+# sentences are collapsed to their first occurrence. Claim spans are found
+# on the original page text afterwards (see align.py), so the cleaned text
+# needs no offset mapping.
+
+# Chrome that makes up a whole line ("Advertisement", "Share on X", "Privacy policy")
+_CHROME_PHRASE = (
+    r"(?:advertisement|sponsored(?: content)?|back to top|skip to (?:main )?content|enable javascript|"
+    r"log ?in to comment|share (?:this|on) (?:article|page|post|facebook|twitter|x|whatsapp|linkedin|email)|"
+    r"follow us(?: on \w+)?|privacy (?:policy|notice|settings)|terms (?:of (?:use|service)|and conditions)|"
+    r"(?:manage )?cookie (?:policy|settings|preferences)|accept (?:all )?cookies|all rights reserved|"
+    r"about us|contact(?: us)?|sitemap|accessibility)"
+)
+_BOILERPLATE_LINE_RE = re.compile(r"^\W*" + _CHROME_PHRASE + r"\W*$", re.IGNORECASE)
+
+# Banners and footers recognised by how the line starts (matched on lines under BOILERPLATE_MAX_CHARS)
+_BOILERPLATE_START_RE = re.compile(
+    r"^\W*(?:we use cookies|this (?:site|website) uses cookies|(?:sign up for|subscribe to) (?:our|the) newsletter)\b"
+    r"|^\s*(?:©|\(c\)|copyright\b)",
+    re.IGNORECASE,
+)
+
+BOILERPLATE_MAX_CHARS = 300
+
+# Footer link rows: "About us | Contact | Privacy policy"
+_LINK_ROW_SEPARATOR_RE = re.compile(r"\s+[|·•]\s+")
+
+# Buttons and widget labels that stand alone on a line ("Reply", "Helpful (212)")
+_UI_LABEL_RE = re.compile(
+    r"^(?:reply|report|helpful|share|email|print(?: recipe)?|jump to recipe|pin(?: it| this for later)?|"
+    r"copy link|add to (?:cart|basket|bag)|buy now|verified purchase|load more|show more|see more|view all|"
+    r"leave a comment|comments)[!.]?\s*(?:\(\d[\d,]*\))?$",
+    re.IGNORECASE,
+)
+
+# Headings that open a block of links to other articles
+_RELATED_HEADING_RE = re.compile(
+    r"^\s*(?:related(?: articles| stories| content| posts)?|you (?:may|might) also like|recommended(?: for you)?|"
+    r"more (?:from|stories|on this topic)|read (?:more|next)|most (?:popular|read)|trending(?: now)?|"
+    r"popular (?:posts|stories)|latest (?:news|stories)|top stories|related questions|you may have missed|"
+    r"customers (?:also viewed|also bought|who bought this)|frequently bought together)\s*:?\s*$",
+    re.IGNORECASE,
+)
+
+# Verbs that make a short line read as a claim ("Cures cancer in weeks",
+# "Detoxes your liver") rather than a menu entry ("Health & Wellness")
+_CLAIM_VERB_RE = re.compile(
+    r"\b(?:cure|treat|heal|prevent|reverse|boost|detox|cleanse|burn|melt|flush|kill|fight|lower|reduce|raise|"
+    r"increase|improve|cause|stop|block|protect|strengthen|repair|regrow|balance|eliminate|destroy|shrink)"
+    r"(?:s|es|d|ed|ing)?\b",
+    re.IGNORECASE,
+)
+
+_SENTENCE_END_RE = re.compile(r"[.!?][\"'”’)\]]*$")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+
+# Sentences shorter than this ("Yes.", "Read more.") are never treated as duplicates
+MIN_DUPLICATE_CHARS = 20
+
+
+class CleanedText:
+    """Cleaned page text plus counts of what was removed"""
+
+    def __init__(self, original):
+        self.original = original
+        self._parts = []
+        self.boilerplate_lines = 0
+        self.navigation_lines = 0
+        self.related_lines = 0
+        self.duplicates_removed = 0
+        self.text = ""
+
+    def _append(self, piece, separator):
+        if self._parts:
+            self._parts.append(separator)
+        self._parts.append(piece)
+
+    def _finish(self):
+        self.text = "".join(self._parts)
+        self._parts = []
+
+    def stats(self):
+        return {
+            "input_chars": len(self.original),
+            "output_chars": len(self.text),
+            "boilerplate_lines": self.boilerplate_lines,
+            "navigation_lines": self.navigation_lines,
+            "related_lines": self.related_lines,
+            "duplicates_removed": self.duplicates_removed,
+        }
+
+
+def _is_boilerplate(line):
+    """Chrome lines: a whole-line chrome phrase, a banner opening, a widget label or a footer link row"""
+    if len(line) > BOILERPLATE_MAX_CHARS:
+        return False
+    if _BOILERPLATE_LINE_RE.match(line) or _BOILERPLATE_START_RE.match(line) or _UI_LABEL_RE.match(line):
+        return True
+    parts = _LINK_ROW_SEPARATOR_RE.split(line)
+    if len(parts) < 3 or any(len(part.split()) > 4 for part in parts):
+        return False
+    return any(_BOILERPLATE_LINE_RE.match(part) for part in parts)
+
+
+def _reads_as_claim(line):
+    """Short bulleted claims look like menu entries; a health term plus a claim verb tells them apart"""
+    return bool(_CLAIM_VERB_RE.search(line)) and bool(health_terms(line))
+
+
+def _is_short_label(line, max_words):
+    """Menu entries, breadcrumb parts, buttons: a few words without sentence punctuation"""
+    return len(line.split()) <= max_words and not _SENTENCE_END_RE.search(line)
+
+
+def _is_menu_entry(line, max_words):
+    # A related-articles heading ends a menu run so its link list is handled as a block
+    return bool(line) and _is_short_label(line, max_words) and not _RELATED_HEADING_RE.match(line)
+
+
+def _is_linked_title(line):
+    """Headlines in a link list: short, not ending in a full stop (questions are common
+    titles) and not a widget label, which marks the end of the list"""
+    return (
+        bool(line)
+        and len(line.split()) <= 15
+        and not line.rstrip("\"'”’)]").endswith(".")
+        and not _UI_LABEL_RE.match(line)
+    )
+
+
+def clean_page_text(text, nav_max_words=4, nav_min_run=3, min_duplicate_chars=MIN_DUPLICATE_CHARS):
+    """Strip boilerplate and repeats from page text; returns a CleanedText.
+
+    Removed: lines that are known chrome (cookie banners, copyright, share
+    bars), runs of ``nav_min_run`` or more short labels (menus), headed
+    "related articles" link lists, and any line or sentence already seen
+    earlier on the page. A lone short label, such as a heading, is kept, and
+    so is a run of short lines when one of them reads as a health claim.
+    """
+    cleaned = CleanedText(text)
+    lines = [raw.strip() for raw in (text or "").split("\n")]
+
+    # Pass 1: decide which lines are chrome
+    drop = [False] * len(lines)
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        if not line:
+            index += 1
+            continue
+        if _is_boilerplate(line):
+            drop[index] = True
+            cleaned.boilerplate_lines += 1
+            index += 1
+            continue
+        if _RELATED_HEADING_RE.match(line):
+            drop[index] = True
+            cleaned.related_lines += 1
+            index += 1
+            while index < len(lines) and _is_linked_title(lines[index]):
+                drop[index] = True
+                cleaned.related_lines += 1
+                index += 1
+            continue
+        if _is_short_label(line, nav_max_words):
+            run_end = index
+            while run_end < len(lines) and _is_menu_entry(lines[run_end], nav_max_words):
+                run_end += 1
+            if run_end - index >= nav_min_run and not any(map(_reads_as_claim, lines[index:run_end])):
+                for position in range(index, run_end):
+                    drop[position] = True
+                cleaned.navigation_lines += run_end - index
+                index = run_end
+                continue
+        index += 1
+
+    # Pass 2: keep first occurrences, sentence by sentence
+    seen = set()
+    pending_break = False
+    for line, dropped in zip(lines, drop):
+        if not line:
+            pending_break = bool(cleaned._parts)
+            continue
+        if dropped:
+            continue
+        line_key = normalize_content(line)
+        if line_key in seen:
+            cleaned.duplicates_removed += 1
+            continue
+        separator = "\n\n" if pending_break else "\n"
+        for sentence in _SENTENCE_SPLIT_RE.split(line):
+            key = normalize_content(sentence)
+            if len(key) >= min_duplicate_chars:
+                if key in seen:
+                    cleaned.duplicates_removed += 1
+                    continue
+                seen.add(key)
+            cleaned._append(sentence, separator)
+            separator = " "
+            pending_break = False
+        seen.add(line_key)
+    cleaned._finish()
+    return cleaned
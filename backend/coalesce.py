@@ -0,0 +1,73 @@
+import threading
+
+import resilience
+from resilience import DeadlineExceeded
+
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers that arrive while it
+    is still running wait for it and receive the same result (or exception).
+    A waiting caller gives up with DeadlineExceeded when its own request
+    deadline passes, whatever the first caller's deadline is. If the first
+    caller fails because its own deadline passed, waiting callers don't share
+    that error: they call again (one of them running the function) within
+    their own deadlines.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.collapsed = 0
+
+    def do(self, key, fn):
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = _InFlightCall()
+                    self._calls[key] = call
+                    self.executed += 1
+                else:
+                    self.collapsed += 1
+            if leader:
+                break
+
+            left = resilience.remaining()
+            if not call.done.wait(None if left is None else max(left, 0)):
+                raise DeadlineExceeded("Request deadline exceeded waiting for a coalesced model call", 1.0)
+            if isinstance(call.error, DeadlineExceeded):
+                # The first caller ran out of its own time; try again within ours
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "collapsed": self.collapsed,
+                "in_flight": len(self._calls),
+            }
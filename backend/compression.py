@@ -0,0 +1,225 @@
+import io
+import json
+import logging
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional; only gzip and deflate are offered without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_BYTES = 64 * 1024
+
+_DECODE_ERRORS = (zlib.error, brotli.error) if brotli is not None else (zlib.error,)
+
+# Response types worth compressing; images and other binary bodies are left alone
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class _Decoder:
+    """Incremental decompressor that never inflates past ``max_bytes``"""
+
+    def __init__(self, encoding, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        if encoding == "br":
+            self._brotli = brotli.Decompressor()
+            self._zlib = None
+        else:
+            # gzip, or zlib-wrapped deflate
+            self._brotli = None
+            self._zlib = zlib.decompressobj(16 + zlib.MAX_WBITS if encoding == "gzip" else zlib.MAX_WBITS)
+
+    def _count(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise BodyTooLarge()
+        return data
+
+    def feed(self, data):
+        if self._brotli is not None:
+            # Brotli has no output cap per call, so feed it small slices and check after each
+            output = []
+            for start in range(0, len(data), 1024):
+                output.append(self._count(self._brotli.process(data[start:start + 1024])))
+            return b"".join(output)
+        output = [self._count(self._zlib.decompress(data, self.max_bytes - self.size + 1))]
+        while self._zlib.unconsumed_tail:
+            output.append(self._count(self._zlib.decompress(self._zlib.unconsumed_tail, self.max_bytes - self.size + 1)))
+        return b"".join(output)
+
+    def finish(self):
+        if self._zlib is not None:
+            return self._count(self._zlib.flush())
+        return b""
+
+
+def supported_encodings():
+    return ("gzip", "deflate", "br") if brotli is not None else ("gzip", "deflate")
+
+
+def _error(start_response, status, message):
+    body = json.dumps({"error": message}).encode("utf-8")
+    start_response(status, [("Content-Type", "application/json"), ("Content-Length", str(len(body)))])
+    return [body]
+
+
+class RequestDecompressionMiddleware:
+    """WSGI middleware that accepts gzip, deflate and (with brotli installed) br request bodies.
+
+    The body is read and inflated in chunks. Reading stops with 413 as soon as
+    the compressed size passes ``max_body_bytes`` or the inflated size passes
+    ``max_decoded_bytes``, so a small compressed upload can't expand into an
+    unbounded buffer. The app then sees an ordinary uncompressed body.
+    """
+
+    def __init__(self, app, max_body_bytes, max_decoded_bytes):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.max_decoded_bytes = max_decoded_bytes
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get("HTTP_CONTENT_ENCODING", "").strip().lower()
+        if not encoding or encoding == "identity":
+            return self.app(environ, start_response)
+        if encoding not in supported_encodings():
+            return _error(start_response, "415 Unsupported Media Type", f"Unsupported Content-Encoding: {encoding}")
+
+        content_length = environ.get("CONTENT_LENGTH")
+        try:
+            remaining = int(content_length) if content_length else None
+        except ValueError:
+            return _error(start_response, "400 Bad Request", "Invalid Content-Length")
+        if remaining is not None and remaining > self.max_body_bytes:
+            return _error(start_response, "413 Request Entity Too Large", "Request body too large")
+        if remaining is None and not environ.get("wsgi.input_terminated"):
+            return _error(start_response, "411 Length Required", "Compressed bodies need a Content-Length")
+
+        stream = environ["wsgi.input"]
+        decoder = _Decoder(encoding, self.max_decoded_bytes)
+        decoded = io.BytesIO()
+        received = 0
+        try:
+            while remaining is None or remaining > 0:
+                chunk = stream.read(READ_CHUNK_BYTES if remaining is None else min(READ_CHUNK_BYTES, remaining))
+                if not chunk:
+                    break
+                received += len(chunk)
+                if remaining is not None:
+                    remaining -= len(chunk)
+                if received > self.max_body_bytes:
+                    raise BodyTooLarge()
+                decoded.write(decoder.feed(chunk))
+            decoded.write(decoder.finish())
+        except BodyTooLarge:
+            logger.warning(f"Rejected {encoding} request body over the size limit after {received} bytes")
+            return _error(start_response, "413 Request Entity Too Large", "Request body too large")
+        except _DECODE_ERRORS as e:
+            return _error(start_response, "400 Bad Request", f"Could not decode {encoding} body: {e}")
+
+        body = decoded.getvalue()
+        environ = dict(environ)
+        environ.pop("HTTP_CONTENT_ENCODING", None)
+        environ["CONTENT_LENGTH"] = str(len(body))
+        environ["wsgi.input"] = io.BytesIO(body)
+        environ["wsgi.input_terminated"] = True
+        environ["healthguard.request_wire_bytes"] = received
+        return self.app(environ, start_response)
+
+
+def choose_encoding(accept_encoding):
+    """Pick br, then gzip, from an Accept-Encoding header (ignoring q=0 entries)"""
+    offered = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip().lower()] = quality
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if offered.get(encoding, offered.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+class _Encoder:
+    def __init__(self, encoding, gzip_level, brotli_quality):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        if self._brotli is not None:
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def flush(self):
+        """Emit everything compressed so far without ending the stream"""
+        if self._brotli is not None:
+            return self._brotli.flush()
+        return self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def _compress_stream(chunks, encoder):
+    # Flush after every chunk so each NDJSON record reaches the client as soon as it is produced
+    try:
+        for chunk in chunks:
+            if chunk:
+                data = encoder.compress(chunk if isinstance(chunk, bytes) else chunk.encode("utf-8"))
+                yield data + encoder.flush()
+        yield encoder.finish()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def compress_response(response, accept_encoding, min_bytes=1024, gzip_level=6, brotli_quality=5):
+    """Compress a Flask response in place for the client's Accept-Encoding.
+
+    Buffered bodies under ``min_bytes`` are left as they are. Streamed bodies
+    are compressed chunk by chunk and flushed, so they still arrive record by
+    record. A strong ETag becomes weak, since the bytes differ per encoding.
+    """
+    if response.status_code < 200 or response.status_code in (204, 304) or "Content-Encoding" in response.headers:
+        return response
+    if not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return response
+
+    encoder = _Encoder(encoding, gzip_level, brotli_quality)
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoder)
+        response.headers.pop("Content-Length", None)
+    else:
+        body = response.get_data()
+        if len(body) < min_bytes:
+            return response
+        response.set_data(encoder.compress(body) + encoder.finish())
+    response.headers["Content-Encoding"] = encoding
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        response.headers["ETag"] = f"W/{etag}"
+    return response
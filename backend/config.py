@@ -0,0 +1,167 @@
+import math
+import os
+
+# Runtime settings for the HealthGuard backend.
+# Every value can be overridden with an environment variable of the same name.
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _env_str(name, default):
+    value = os.environ.get(name)
+    return value if value not in (None, "") else default
+
+
+# Response cache
+CACHE_ENABLED = _env_str("HEALTHGUARD_CACHE_ENABLED", "1") not in ("0", "false", "no")
+CACHE_MAX_ENTRIES = _env_int("HEALTHGUARD_CACHE_MAX_ENTRIES", 1024)
+CACHE_TTL_SECONDS = _env_int("HEALTHGUARD_CACHE_TTL_SECONDS", 6 * 60 * 60)
+CACHE_DB_PATH = _env_str("HEALTHGUARD_CACHE_DB_PATH", "")  # empty = memory only
+
+# Page scanning
+SCAN_CHUNK_CHARS = _env_int("HEALTHGUARD_SCAN_CHUNK_CHARS", 6000)
+SCAN_MAX_WORKERS = _env_int("HEALTHGUARD_SCAN_MAX_WORKERS", 4)
+SCAN_MAX_CHUNKS = _env_int("HEALTHGUARD_SCAN_MAX_CHUNKS", 20)
+
+# Local health-relevance prefilter
+PREFILTER_ENABLED = _env_str("HEALTHGUARD_PREFILTER_ENABLED", "1") not in ("0", "false", "no")
+PREFILTER_MIN_TERMS = _env_int("HEALTHGUARD_PREFILTER_MIN_TERMS", 1)
+
+# Pre-fork serving (gunicorn.conf.py): processes serving the app on this host.
+# The upstream limits below are for the whole server; each process enforces its share.
+WORKERS = max(1, _env_int("HEALTHGUARD_WORKERS", 1))
+# Directory where every process writes metric snapshots so /metrics covers the whole server
+# (gunicorn.conf.py sets one up); empty = /metrics describes only the process that answers
+METRICS_DIR = _env_str("HEALTHGUARD_METRICS_DIR", "")
+METRICS_SYNC_SECONDS = _env_float("HEALTHGUARD_METRICS_SYNC_SECONDS", 5.0)
+
+
+def _worker_share(total):
+    return max(1, math.ceil(total / WORKERS)) if total > 0 else total
+
+
+# Model client and serving
+MODEL_NAME = _env_str("HEALTHGUARD_MODEL_NAME", "models/gemini-1.5-flash")
+MAX_UPSTREAM_CONCURRENCY = _worker_share(_env_int("HEALTHGUARD_MAX_UPSTREAM_CONCURRENCY", 16))
+ASGI_MAX_IN_FLIGHT = _env_int("HEALTHGUARD_ASGI_MAX_IN_FLIGHT", 256)
+# Load the model client, Pillow and Flask's request path when a worker starts instead of on first use
+WARMUP_ON_START = _env_str("HEALTHGUARD_WARMUP_ON_START", "0") not in ("0", "false", "no")
+
+# Upstream scheduling: a token bucket sized to the model quota, plus per-priority queues
+UPSTREAM_RPM = _worker_share(_env_int("HEALTHGUARD_UPSTREAM_RPM", 1000))  # 0 = no rate limit
+UPSTREAM_BURST = _worker_share(_env_int("HEALTHGUARD_UPSTREAM_BURST", 20))
+QUOTA_BACKOFF_SECONDS = _env_float("HEALTHGUARD_QUOTA_BACKOFF_SECONDS", 10.0)  # pause after an upstream 429
+SCHED_QUEUE_INTERACTIVE = _env_int("HEALTHGUARD_SCHED_QUEUE_INTERACTIVE", 64)
+SCHED_QUEUE_BATCH = _env_int("HEALTHGUARD_SCHED_QUEUE_BATCH", 32)
+SCHED_QUEUE_BACKGROUND = _env_int("HEALTHGUARD_SCHED_QUEUE_BACKGROUND", 256)
+SCHED_WAIT_INTERACTIVE = _env_float("HEALTHGUARD_SCHED_WAIT_INTERACTIVE", 10.0)  # seconds
+SCHED_WAIT_BATCH = _env_float("HEALTHGUARD_SCHED_WAIT_BATCH", 30.0)
+SCHED_WAIT_BACKGROUND = _env_float("HEALTHGUARD_SCHED_WAIT_BACKGROUND", 60.0)
+
+# Deadlines, hedged calls and the circuit breaker around model calls
+REQUEST_DEADLINE_SECONDS = _env_float("HEALTHGUARD_REQUEST_DEADLINE_SECONDS", 30.0)  # clients may ask for less (X-Deadline-Ms)
+SCAN_DEADLINE_SECONDS = _env_float("HEALTHGUARD_SCAN_DEADLINE_SECONDS", 120.0)  # /scan-page and /validate-batch
+UPSTREAM_TIMEOUT_SECONDS = _env_float("HEALTHGUARD_UPSTREAM_TIMEOUT_SECONDS", 30.0)  # one model call
+HEDGE_ENABLED = _env_str("HEALTHGUARD_HEDGE_ENABLED", "1") not in ("0", "false", "no")
+HEDGE_PERCENTILE = _env_float("HEALTHGUARD_HEDGE_PERCENTILE", 95.0)  # hedge calls slower than this latency
+HEDGE_MIN_SAMPLES = _env_int("HEALTHGUARD_HEDGE_MIN_SAMPLES", 20)  # latencies needed before hedging an endpoint
+HEDGE_MIN_DELAY_MS = _env_int("HEALTHGUARD_HEDGE_MIN_DELAY_MS", 200)
+HEDGE_WINDOW = _env_int("HEALTHGUARD_HEDGE_WINDOW", 200)  # recent latencies kept per endpoint
+HEDGE_MAX_RATIO = _env_float("HEALTHGUARD_HEDGE_MAX_RATIO", 0.1)  # hedges per call, at most
+BREAKER_WINDOW = _env_int("HEALTHGUARD_BREAKER_WINDOW", 20)  # recent calls judged
+BREAKER_MIN_CALLS = _env_int("HEALTHGUARD_BREAKER_MIN_CALLS", 10)
+BREAKER_FAILURE_RATIO = _env_float("HEALTHGUARD_BREAKER_FAILURE_RATIO", 0.5)
+BREAKER_OPEN_SECONDS = _env_float("HEALTHGUARD_BREAKER_OPEN_SECONDS", 30.0)
+STALE_SECONDS = _env_int("HEALTHGUARD_STALE_SECONDS", 7 * 24 * 60 * 60)  # past TTL, servable while the upstream is down
+
+# LLM backend: "gemini" for production, "stub" for offline load tests
+LLM_BACKEND = _env_str("HEALTHGUARD_LLM_BACKEND", "gemini")
+STUB_LATENCY_MS = _env_int("HEALTHGUARD_STUB_LATENCY_MS", 300)
+STUB_JITTER_MS = _env_int("HEALTHGUARD_STUB_JITTER_MS", 100)
+STUB_SLOW_RATE = _env_float("HEALTHGUARD_STUB_SLOW_RATE", 0.0)
+STUB_SLOW_MS = _env_int("HEALTHGUARD_STUB_SLOW_MS", 3000)
+STUB_ERROR_RATE = _env_float("HEALTHGUARD_STUB_ERROR_RATE", 0.0)
+STUB_MALFORMED_RATE = _env_float("HEALTHGUARD_STUB_MALFORMED_RATE", 0.0)
+STUB_SEED = _env_int("HEALTHGUARD_STUB_SEED", 0)
+STUB_LIGHT_LATENCY_MS = _env_int("HEALTHGUARD_STUB_LIGHT_LATENCY_MS", 100)  # stub stand-in for CASCADE_LIGHT_MODEL
+
+# Single-flight coalescing of identical in-flight upstream calls
+COALESCE_ENABLED = _env_str("HEALTHGUARD_COALESCE_ENABLED", "1") not in ("0", "false", "no")
+
+# Prompt token budgets (estimated tokens for the whole prompt; content is cut at a sentence boundary)
+PROMPT_BUDGET_VALIDATE = _env_int("HEALTHGUARD_PROMPT_BUDGET_VALIDATE", 1100)
+PROMPT_BUDGET_ANALYZE_MULTIPLE = _env_int("HEALTHGUARD_PROMPT_BUDGET_ANALYZE_MULTIPLE", 1100)
+PROMPT_BUDGET_DOCTOR_MODE = _env_int("HEALTHGUARD_PROMPT_BUDGET_DOCTOR_MODE", 1000)
+PROMPT_BUDGET_IMAGE_TEXT = _env_int("HEALTHGUARD_PROMPT_BUDGET_IMAGE_TEXT", 4400)  # text sent alongside an image
+
+# Structured-output decoding
+JSON_MODE = _env_str("HEALTHGUARD_JSON_MODE", "1") not in ("0", "false", "no")  # ask Gemini for application/json
+DECODE_MAX_RETRIES = _env_int("HEALTHGUARD_DECODE_MAX_RETRIES", 1)  # re-asks per request
+DECODE_RETRY_RATIO = _env_float("HEALTHGUARD_DECODE_RETRY_RATIO", 0.1)  # re-asks per decoded reply, process-wide
+
+# Page text cleaning before scanning (boilerplate lines, menus, related-article lists, repeats)
+CLEAN_ENABLED = _env_str("HEALTHGUARD_CLEAN_ENABLED", "1") not in ("0", "false", "no")
+CLEAN_NAV_MAX_WORDS = _env_int("HEALTHGUARD_CLEAN_NAV_MAX_WORDS", 4)  # longest line treated as a menu entry
+CLEAN_NAV_MIN_RUN = _env_int("HEALTHGUARD_CLEAN_NAV_MIN_RUN", 3)  # consecutive entries that make a menu
+
+# Confidence cascade: cheaper tiers answer first, claims under a tier's threshold go on to the next.
+# Tiers: "rules" (local table of well-established claims), "light" (CASCADE_LIGHT_MODEL)
+# and "full" (MODEL_NAME, always last). Only the full model answers by default; opt in with e.g. "rules,full".
+CASCADE_TIERS = tuple(t.strip() for t in _env_str("HEALTHGUARD_CASCADE_TIERS", "full").split(",") if t.strip())
+CASCADE_RULES_MIN_CONFIDENCE = _env_int("HEALTHGUARD_CASCADE_RULES_MIN_CONFIDENCE", 90)  # 0-100, like confidence_score
+CASCADE_LIGHT_MODEL = _env_str("HEALTHGUARD_CASCADE_LIGHT_MODEL", "")  # e.g. models/gemini-1.5-flash-8b
+CASCADE_LIGHT_MIN_CONFIDENCE = _env_int("HEALTHGUARD_CASCADE_LIGHT_MIN_CONFIDENCE", 85)
+
+# Claim span offsets in the submitted page text
+SPAN_MIN_SCORE = _env_float("HEALTHGUARD_SPAN_MIN_SCORE", 0.6)  # share of claim words a paraphrase must match
+
+# Batch claim validation
+BATCH_MAX_CLAIMS = _env_int("HEALTHGUARD_BATCH_MAX_CLAIMS", 200)
+BATCH_TOKEN_BUDGET = _env_int("HEALTHGUARD_BATCH_TOKEN_BUDGET", 4000)
+BATCH_MAX_CLAIMS_PER_PACK = _env_int("HEALTHGUARD_BATCH_MAX_CLAIMS_PER_PACK", 20)
+BATCH_MAX_WORKERS = _env_int("HEALTHGUARD_BATCH_MAX_WORKERS", 4)
+
+# Cross-page claim verdict store
+VERDICT_STORE_ENABLED = _env_str("HEALTHGUARD_VERDICT_STORE_ENABLED", "1") not in ("0", "false", "no")
+VERDICT_MAX_ENTRIES = _env_int("HEALTHGUARD_VERDICT_MAX_ENTRIES", 50000)
+VERDICT_TTL_SECONDS = _env_int("HEALTHGUARD_VERDICT_TTL_SECONDS", 7 * 24 * 60 * 60)
+VERDICT_DB_PATH = _env_str("HEALTHGUARD_VERDICT_DB_PATH", "")  # empty = memory only
+VERDICT_VERSION = _env_str("HEALTHGUARD_VERDICT_VERSION", "1")  # bump to discard stored verdicts
+
+# Incremental re-scans of previously scanned URLs
+PAGE_STORE_ENABLED = _env_str("HEALTHGUARD_PAGE_STORE_ENABLED", "1") not in ("0", "false", "no")
+PAGE_STORE_MAX_PAGES = _env_int("HEALTHGUARD_PAGE_STORE_MAX_PAGES", 5000)
+PAGE_STORE_TTL_SECONDS = _env_int("HEALTHGUARD_PAGE_STORE_TTL_SECONDS", 24 * 60 * 60)
+PAGE_STORE_DB_PATH = _env_str("HEALTHGUARD_PAGE_STORE_DB_PATH", "")  # empty = memory only
+
+# Finished /scan-page results per (URL, content hash), served by ETag
+SCAN_RESULTS_ENABLED = _env_str("HEALTHGUARD_SCAN_RESULTS_ENABLED", "1") not in ("0", "false", "no")
+# SQLite only, so empty = off; gunicorn.conf.py points it at the shared database
+SCAN_RESULTS_DB_PATH = _env_str("HEALTHGUARD_SCAN_RESULTS_DB_PATH", "")
+SCAN_RESULTS_MAX_ENTRIES = _env_int("HEALTHGUARD_SCAN_RESULTS_MAX_ENTRIES", 20000)
+SCAN_RESULTS_TTL_SECONDS = _env_int("HEALTHGUARD_SCAN_RESULTS_TTL_SECONDS", 24 * 60 * 60)
+
+# Compressed request and response bodies
+MAX_DECODED_REQUEST_BYTES = _env_int("HEALTHGUARD_MAX_DECODED_REQUEST_BYTES", 16 * 1024 * 1024)  # after inflating
+RESPONSE_COMPRESSION_ENABLED = _env_str("HEALTHGUARD_RESPONSE_COMPRESSION_ENABLED", "1") not in ("0", "false", "no")
+RESPONSE_COMPRESSION_MIN_BYTES = _env_int("HEALTHGUARD_RESPONSE_COMPRESSION_MIN_BYTES", 1024)
+GZIP_LEVEL = _env_int("HEALTHGUARD_GZIP_LEVEL", 6)
+BROTLI_QUALITY = _env_int("HEALTHGUARD_BROTLI_QUALITY", 5)
+
+# Image uploads (image_text requests)
+MAX_REQUEST_BYTES = _env_int("HEALTHGUARD_MAX_REQUEST_BYTES", 16 * 1024 * 1024)  # as sent, compressed or not
+IMAGE_MAX_BYTES = _env_int("HEALTHGUARD_IMAGE_MAX_BYTES", 8 * 1024 * 1024)  # decoded size
+IMAGE_MAX_PIXELS = _env_int("HEALTHGUARD_IMAGE_MAX_PIXELS", 40_000_000)
+IMAGE_MAX_SIDE = _env_int("HEALTHGUARD_IMAGE_MAX_SIDE", 1536)  # longest side sent to the model
+IMAGE_JPEG_QUALITY = _env_int("HEALTHGUARD_IMAGE_JPEG_QUALITY", 85)
+IMAGE_PHASH_DISTANCE = _env_int("HEALTHGUARD_IMAGE_PHASH_DISTANCE", 4)  # bits; 0 = exact matches only
+IMAGE_PHASH_MIN_BITS = _env_int("HEALTHGUARD_IMAGE_PHASH_MIN_BITS", 16)  # set and clear; flatter images match exactly only
+IMAGE_PHASH_INDEX_SIZE = _env_int("HEALTHGUARD_IMAGE_PHASH_INDEX_SIZE", 4096)
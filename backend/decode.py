@@ -0,0 +1,275 @@
+import json
+import logging
+import re
+import threading
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib json module is used instead
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Appended to the prompt when a reply could not be decoded and is asked for again
+RETRY_INSTRUCTION = (
+    "\n\nYour previous reply could not be parsed. Reply again with one valid JSON "
+    "object only, exactly in the format described above, with no text around it."
+)
+
+_FENCE_RE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+_TRAILING_COMMA_RE = re.compile(r",(\s*[}\]])")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+_PYTHON_LITERALS_RE = re.compile(r"(:\s*|\[\s*|,\s*)(True|False|None)(?=\s*[,}\]])")
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def loads(text):
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def dumps(value, default=None):
+    if orjson is not None:
+        return orjson.dumps(value, default=default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(value, default=default)
+
+
+class DecodeError(ValueError):
+    """Raised when a model reply cannot be turned into output matching the endpoint schema"""
+
+    def __init__(self, message, raw=""):
+        super().__init__(message)
+        self.raw = raw or ""
+
+
+class Schema:
+    """Minimal shape check for a model reply.
+
+    ``required`` keys must all be present, and at least one of ``required_any``
+    when given. ``lists`` maps list fields to the keys each item needs; items
+    that are not objects or miss a key are dropped rather than failing the
+    whole reply. A reply with ``"is_health_related": false`` is always valid.
+    """
+
+    def __init__(self, required=(), required_any=(), lists=None):
+        self.required = required
+        self.required_any = required_any
+        self.lists = lists or {}
+
+    def check(self, output):
+        """Return the (possibly repaired) output, or raise DecodeError"""
+        if isinstance(output, list) and len(output) == 1:
+            output = output[0]
+        if not isinstance(output, dict):
+            raise DecodeError(f"Expected a JSON object, got {type(output).__name__}")
+        if output.get("is_health_related") is False:
+            return output
+        missing = [key for key in self.required if key not in output]
+        if missing:
+            raise DecodeError(f"Missing required field(s): {', '.join(missing)}")
+        if self.required_any and not any(key in output for key in self.required_any):
+            raise DecodeError(f"Expected one of: {', '.join(self.required_any)}")
+        for field, item_keys in self.lists.items():
+            if field not in output:
+                continue
+            items = output[field]
+            if items is None:
+                items = []
+            elif isinstance(items, dict):
+                items = [items]
+            elif not isinstance(items, list):
+                raise DecodeError(f"Field {field} is not a list")
+            output[field] = [
+                item for item in items
+                if isinstance(item, dict) and all(key in item for key in item_keys)
+            ]
+        return output
+
+
+_CLAIM_KEYS = ("claim_text", "classification")
+
+SCHEMAS = {
+    "validate": Schema(required_any=("claims", "classification"), lists={"claims": _CLAIM_KEYS}),
+    "analyze-multiple": Schema(required=("claims",), lists={"claims": _CLAIM_KEYS}),
+    "doctor-mode": Schema(required_any=("response_type", "condition_overview", "detailed_explanation")),
+    "scan-page": Schema(required=("claims",), lists={"claims": _CLAIM_KEYS}),
+    "validate-batch": Schema(required=("results",), lists={"results": ()}),
+}
+
+
+def extract_json(text):
+    """Strip markdown fences and any prose around the outermost JSON object.
+
+    Returns (candidate, tail): the text between the first "{" and the last "}",
+    and everything from the first "{" on, for replies that were cut off.
+    """
+    text = _FENCE_RE.sub("", text.strip()).strip().strip("`").strip()
+    start = text.find("{")
+    if start == -1:
+        return text, text
+    end = text.rfind("}")
+    return (text[start:end + 1] if end > start else text[start:]), text[start:]
+
+
+def _close_truncated(text):
+    """Close strings, arrays and objects left open by a reply cut off mid-way"""
+    stack = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = text.rstrip().rstrip(",")
+    if text.endswith(":"):
+        text += " null"
+    return text + "".join(reversed(stack))
+
+
+def repair_json(text):
+    """Fix the malformations models commonly produce: smart quotes, trailing commas,
+    Python literals and truncated output"""
+    text = text.translate(_SMART_QUOTES)
+    text = _PYTHON_LITERALS_RE.sub(lambda m: m.group(1) + _PYTHON_LITERALS[m.group(2)], text)
+    text = _close_truncated(text)
+    return _TRAILING_COMMA_RE.sub(r"\1", text)
+
+
+class RetryBudget:
+    """Caps re-asks at a fraction of decoded replies so a bad model version can't double traffic.
+
+    Every reply deposits ``ratio`` tokens (up to ``max_tokens``); a retry spends one.
+    """
+
+    def __init__(self, ratio=0.1, max_tokens=10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = float(max_tokens)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class DecodeStats:
+    """Per-endpoint counts of how model replies were decoded.
+
+    ``parse_failure_rate`` is the share of replies that did not decode as-is
+    (repaired, re-asked or failed).
+    """
+
+    FIELDS = ("replies", "clean", "repaired", "retries", "failures")
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def incr(self, endpoint, field):
+        with self._lock:
+            counts = self._counts.setdefault(endpoint, dict.fromkeys(self.FIELDS, 0))
+            counts[field] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: dict(counts) for endpoint, counts in self._counts.items()}
+
+    def stats(self):
+        stats = {}
+        for endpoint, counts in self.snapshot().items():
+            stats[endpoint] = dict(
+                counts,
+                parse_failure_rate=round((counts["replies"] - counts["clean"]) / counts["replies"], 4)
+                if counts["replies"] else 0.0,
+            )
+        return stats
+
+
+def decode_text(endpoint, text):
+    """Decode one reply; returns (output, repaired) or raises DecodeError"""
+    if not text or not text.strip():
+        raise DecodeError("Empty reply from the model")
+    schema = SCHEMAS.get(endpoint) or Schema()
+    candidate, tail = extract_json(text)
+    try:
+        return schema.check(loads(candidate)), False
+    except ValueError:
+        pass
+    # A truncated reply loses less when repaired from its tail than from its last complete "}"
+    error = None
+    for attempt in dict.fromkeys((tail, candidate)):
+        try:
+            return schema.check(loads(repair_json(attempt))), True
+        except ValueError as e:
+            error = e
+    if isinstance(error, DecodeError):
+        error.raw = text
+        raise error
+    raise DecodeError(f"Invalid JSON: {error}", raw=text)
+
+
+def _with_retry_instruction(contents):
+    if isinstance(contents, str):
+        return contents + RETRY_INSTRUCTION
+    contents = list(contents)
+    for position, part in enumerate(contents):
+        if isinstance(part, str):
+            contents[position] = part + RETRY_INSTRUCTION
+            break
+    return contents
+
+
+class ResponseDecoder:
+    """Calls the model and decodes its reply against the endpoint schema.
+
+    Replies are repaired locally first; only replies that still fail are asked
+    for again, at most ``max_retries`` times per request and only while the
+    shared ``RetryBudget`` allows it.
+    """
+
+    def __init__(self, generate, max_retries=1, budget=None):
+        self.generate = generate
+        self.max_retries = max_retries
+        self.budget = budget or RetryBudget()
+        self.stats = DecodeStats()
+
+    def __call__(self, contents, endpoint, coalesce_key=None, model=None):
+        attempt = 0
+        while True:
+            response = self.generate(contents, endpoint=endpoint, coalesce_key=coalesce_key, model=model)
+            self.stats.incr(endpoint, "replies")
+            self.budget.deposit()
+            try:
+                output, repaired = decode_text(endpoint, getattr(response, "text", None) if response else None)
+            except DecodeError as e:
+                if attempt < self.max_retries and self.budget.try_spend():
+                    attempt += 1
+                    self.stats.incr(endpoint, "retries")
+                    logger.warning(f"{endpoint}: undecodable reply ({e}), asking again ({attempt}/{self.max_retries})")
+                    contents = _with_retry_instruction(contents)
+                    # The retry prompt differs, so it must not join the original's in-flight call
+                    coalesce_key = f"{coalesce_key}:retry{attempt}" if coalesce_key else None
+                    continue
+                self.stats.incr(endpoint, "failures")
+                logger.error(f"{endpoint}: giving up on undecodable reply: {e}")
+                raise
+            self.stats.incr(endpoint, "repaired" if repaired else "clean")
+            return output
@@ -0,0 +1,57 @@
+"""gunicorn settings for running the HealthGuard API on every core.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+HEALTHGUARD_WORKERS processes (default: one per CPU) each run
+HEALTHGUARD_THREADS request threads. The app is not preloaded: every worker
+imports it after the fork and opens its own model client and SQLite
+connections, neither of which may cross a fork. Warm state lives in SQLite
+files every worker shares, so a response cached by one worker is a hit in
+all of them, and the upstream limits are split evenly across the workers.
+
+Workers also write metric snapshots to HEALTHGUARD_METRICS_DIR (a fresh
+temporary directory by default), so /metrics reports totals for the whole
+server whichever worker answers the scrape. /health describes the worker
+that answered, plus the list of workers.
+"""
+import glob
+import multiprocessing
+import os
+import tempfile
+
+# Shared by the response cache, verdict store, page fingerprints and stored scan results unless they have their own paths
+SHARED_DB_PATH = os.environ.get("HEALTHGUARD_SHARED_DB_PATH") or "healthguard_shared.db"
+SHARED_DB_SETTINGS = ("HEALTHGUARD_CACHE_DB_PATH", "HEALTHGUARD_VERDICT_DB_PATH", "HEALTHGUARD_PAGE_STORE_DB_PATH",
+                      "HEALTHGUARD_SCAN_RESULTS_DB_PATH")
+
+bind = os.environ.get("HEALTHGUARD_BIND") or "0.0.0.0:5000"
+workers = int(os.environ.get("HEALTHGUARD_WORKERS") or multiprocessing.cpu_count())
+worker_class = "gthread"
+threads = int(os.environ.get("HEALTHGUARD_THREADS") or 8)
+preload_app = False
+# Page scans wait on several model calls
+timeout = int(os.environ.get("HEALTHGUARD_WORKER_TIMEOUT") or 120)
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    # Runs in the master before any fork; config.py reads these when a worker imports the app
+    os.environ["HEALTHGUARD_WORKERS"] = str(server.cfg.workers)
+    for name in SHARED_DB_SETTINGS:
+        if not os.environ.get(name):
+            os.environ[name] = SHARED_DB_PATH
+    # Snapshots left by a previous run would be added to this run's totals
+    metrics_dir = os.environ.get("HEALTHGUARD_METRICS_DIR")
+    if metrics_dir:
+        for path in glob.glob(os.path.join(metrics_dir, "*.json")):
+            os.remove(path)
+    else:
+        os.environ["HEALTHGUARD_METRICS_DIR"] = tempfile.mkdtemp(prefix="healthguard-metrics-")
+    server.log.info(f"{server.cfg.workers} workers x {server.cfg.threads} threads, shared state in {SHARED_DB_PATH}")
+
+
+def post_worker_init(worker):
+    from wsgi import init_worker
+
+    init_worker()
@@ -0,0 +1,167 @@
+import base64
+import binascii
+import logging
+import threading
+import warnings
+from collections import OrderedDict
+from io import BytesIO
+
+from cache import hash_bytes
+
+logger = logging.getLogger(__name__)
+
+
+class ImageRejected(ValueError):
+    """Raised when an uploaded image cannot be accepted; ``status`` is the HTTP status to return"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def load_pillow():
+    """Import Pillow on first use: only image uploads need it, so it stays out of process startup"""
+    from PIL import Image, ImageOps
+
+    return Image, ImageOps
+
+
+class PreparedImage:
+    """A decoded upload re-encoded at model resolution, plus its cache identity.
+
+    ``digest`` is the exact identity (a hash of the re-encoded bytes) used for
+    cache keys and coalescing. ``phash`` only finds near-duplicates and is
+    None when the image is too uniform for it to tell images apart.
+    """
+
+    def __init__(self, data, size, phash, original_size, original_bytes):
+        self.data = data
+        self.size = size
+        self.phash = phash
+        self.original_size = original_size
+        self.original_bytes = original_bytes
+        self.digest = hash_bytes(data)
+
+    def as_part(self):
+        """Inline blob part for generate_content"""
+        return {"mime_type": "image/jpeg", "data": self.data}
+
+
+def decode_data_url(data_url, max_bytes):
+    """Decode a base64 data URL (or bare base64), refusing payloads over ``max_bytes`` before decoding"""
+    encoded = data_url.split(",", 1)[1] if "," in data_url else data_url
+    # 4 base64 characters carry 3 bytes; check the size before allocating the decoded buffer
+    if len(encoded) * 3 // 4 > max_bytes:
+        raise ImageRejected(f"Image exceeds the {max_bytes // (1024 * 1024)} MB upload limit", status=413)
+    try:
+        return base64.b64decode(encoded, validate=False)
+    except (binascii.Error, ValueError):
+        raise ImageRejected("Image data is not valid base64")
+
+
+def perceptual_hash(image, hash_size=8):
+    """64-bit difference hash (dHash) as hex.
+
+    Survives re-encoding, rescaling and small brightness changes, so repeated
+    screenshots of the same post map to the same value.
+    """
+    Image, _ = load_pillow()
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+
+def phash_is_informative(phash, min_bits):
+    """True when at least ``min_bits`` bits of the hash are set and as many are clear.
+
+    Mostly uniform images (text on a white background, a dark photo) give
+    near-constant hashes, so every such image would look like every other.
+    """
+    set_bits = bin(int(phash, 16)).count("1")
+    return min_bits <= set_bits <= len(phash) * 4 - min_bits
+
+
+class PerceptualIndex:
+    """Recently seen perceptual hashes, used to map near-duplicates onto one cache identity.
+
+    Two screenshots of the same post rarely hash identically once they have
+    been cropped slightly or recompressed, but they land within a few bits.
+    ``canonical`` returns the first known hash within ``max_distance`` bits,
+    or registers the new hash.
+    """
+
+    def __init__(self, max_entries=4096, max_distance=4):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.near_matches = 0
+        self._hashes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def canonical(self, phash):
+        value = int(phash, 16)
+        with self._lock:
+            if phash in self._hashes:
+                self._hashes.move_to_end(phash)
+                return phash
+            for known, known_value in self._hashes.items():
+                if bin(value ^ known_value).count("1") <= self.max_distance:
+                    self._hashes.move_to_end(known)
+                    self.near_matches += 1
+                    return known
+            self._hashes[phash] = value
+            while len(self._hashes) > self.max_entries:
+                self._hashes.popitem(last=False)
+            return phash
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._hashes), "near_matches": self.near_matches}
+
+
+def prepare_image(data, max_pixels, max_side, quality, min_phash_bits=16):
+    """Open an uploaded image with bounded memory, downscale it and re-encode it as JPEG.
+
+    Dimensions are checked from the header before any pixel data is decoded.
+    JPEGs are decoded at a reduced scale via ``draft``; everything is then
+    thumbnailed so the longest side is at most ``max_side``. The perceptual
+    hash is dropped unless ``min_phash_bits`` of it are set and clear.
+    """
+    Image, ImageOps = load_pillow()
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            image = Image.open(BytesIO(data))
+            width, height = image.size
+            if width * height > max_pixels:
+                raise ImageRejected(f"Image dimensions {width}x{height} exceed the pixel limit", status=413)
+            image.draft("RGB", (max_side, max_side))
+            image.load()
+    except ImageRejected:
+        raise
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise ImageRejected("Image dimensions exceed the pixel limit", status=413)
+    except Exception as e:
+        raise ImageRejected(f"Could not decode image ({type(e).__name__})")
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA", "P"):
+        # Flatten transparency onto white, as screenshots are shown on a light page
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    phash = perceptual_hash(image)
+    if not phash_is_informative(phash, min_phash_bits):
+        phash = None
+    return PreparedImage(buffer.getvalue(), image.size, phash, (width, height), len(data))
@@ -0,0 +1,355 @@
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import config
+import metrics
+import resilience
+from batch import estimate_tokens
+from coalesce import SingleFlight
+from decode import RetryBudget
+from resilience import CircuitBreaker, DeadlineExceeded, LatencyWindow, UpstreamTimeout
+from scheduler import BACKGROUND, BATCH, INTERACTIVE, PriorityScheduler, UpstreamOverloaded
+
+logger = logging.getLogger(__name__)
+
+# google.generativeai takes most of the app's import time, so it is imported
+# (and configured) when the first Gemini backend is built, not at startup
+_genai = None
+_genai_options = {}
+_genai_lock = threading.Lock()
+
+
+def configure(**options):
+    """Client options for google.generativeai (api_key, ...), applied when it is first imported"""
+    with _genai_lock:
+        _genai_options.update(options)
+        if _genai is not None:
+            _genai.configure(**_genai_options)
+
+
+def load_genai():
+    """Import and configure google.generativeai on first use"""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                started = time.perf_counter()
+                import google.generativeai as genai
+
+                genai.configure(**_genai_options)
+                _genai = genai
+                logger.info(f"Loaded google.generativeai in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return _genai
+
+
+class GeminiBackend:
+    """Production backend: a google-generativeai GenerativeModel"""
+
+    name = "gemini"
+
+    def __init__(self, model_name, json_mode=True):
+        self.model_name = model_name
+        # Every endpoint expects a JSON object, so ask for JSON-typed output
+        generation_config = {"response_mime_type": "application/json"} if json_mode else None
+        self._model = load_genai().GenerativeModel(model_name, generation_config=generation_config)
+
+    def generate_content(self, contents, endpoint=None, timeout=None, cancel=None):
+        # A blocking gRPC call can't be interrupted, so ``cancel`` is ignored; the timeout bounds it instead
+        request_options = {"timeout": timeout} if timeout else None
+        return self._model.generate_content(contents, request_options=request_options)
+
+
+def create_backend(name=None, model_name=None):
+    """Build the backend selected by HEALTHGUARD_LLM_BACKEND (gemini | stub) for ``model_name`` (default MODEL_NAME)"""
+    name = name or config.LLM_BACKEND
+    model_name = model_name or config.MODEL_NAME
+    if name == "gemini":
+        return GeminiBackend(model_name, json_mode=config.JSON_MODE)
+    if name == "stub":
+        from llm_stub import StubBackend
+        # Any other model (the cascade's light tier) answers faster and differently
+        other_model = model_name != config.MODEL_NAME
+        return StubBackend(
+            latency_ms=config.STUB_LIGHT_LATENCY_MS if other_model else config.STUB_LATENCY_MS,
+            jitter_ms=config.STUB_JITTER_MS,
+            slow_rate=config.STUB_SLOW_RATE,
+            slow_ms=config.STUB_SLOW_MS,
+            error_rate=config.STUB_ERROR_RATE,
+            malformed_rate=config.STUB_MALFORMED_RATE,
+            seed=config.STUB_SEED,
+            salt=model_name if other_model else "",
+        )
+    raise ValueError(f"Unknown LLM backend: {name}")
+
+
+# One backend per model per process, shared by every handler and worker thread
+_backends = {}
+_backend_lock = threading.Lock()
+
+# Every upstream call in this process goes through one scheduler: a global
+# concurrency cap, a rate limit sized to the quota, and per-priority queues
+scheduler = PriorityScheduler(
+    max_concurrency=config.MAX_UPSTREAM_CONCURRENCY,
+    rate_per_second=config.UPSTREAM_RPM / 60.0,
+    burst=config.UPSTREAM_BURST,
+    max_queue={
+        INTERACTIVE: config.SCHED_QUEUE_INTERACTIVE,
+        BATCH: config.SCHED_QUEUE_BATCH,
+        BACKGROUND: config.SCHED_QUEUE_BACKGROUND,
+    },
+    max_wait_seconds={
+        INTERACTIVE: config.SCHED_WAIT_INTERACTIVE,
+        BATCH: config.SCHED_WAIT_BATCH,
+        BACKGROUND: config.SCHED_WAIT_BACKGROUND,
+    },
+)
+
+
+def get_backend(model=None):
+    """Return the shared backend for ``model`` (default MODEL_NAME), creating it on first use"""
+    model = model or config.MODEL_NAME
+    backend = _backends.get(model)
+    if backend is None:
+        with _backend_lock:
+            backend = _backends.get(model)
+            if backend is None:
+                backend = _backends[model] = create_backend(model_name=model)
+                logger.info(f"Initialized {backend.name} LLM backend for {model}")
+    return backend
+
+
+def set_backend(backend, model=None):
+    """Replace the shared backend for ``model`` (used by benchmarks to install a stub)"""
+    with _backend_lock:
+        _backends[model or config.MODEL_NAME] = backend
+
+
+# Identical prompts already in flight share one upstream call
+coalescer = SingleFlight() if config.COALESCE_ENABLED else None
+
+# Model calls run on this pool so the caller can stop waiting at its deadline
+# and race a hedged duplicate. Every call on it holds a scheduler slot, so it
+# never needs more threads than the concurrency cap.
+_upstream_pool = ThreadPoolExecutor(
+    max_workers=max(1, config.MAX_UPSTREAM_CONCURRENCY), thread_name_prefix="upstream"
+)
+
+# Fails calls fast (and lets handlers serve stale results) while the upstream is unhealthy
+breaker = CircuitBreaker(
+    window=config.BREAKER_WINDOW,
+    failure_ratio=config.BREAKER_FAILURE_RATIO,
+    min_calls=config.BREAKER_MIN_CALLS,
+    open_seconds=config.BREAKER_OPEN_SECONDS,
+)
+
+# Hedged duplicates are capped at a fraction of calls, like decode retries
+hedge_budget = RetryBudget(ratio=config.HEDGE_MAX_RATIO)
+_latency_windows = {}
+_hedge_counts = {"calls": 0, "sent": 0, "won": 0, "skipped": 0, "timeouts": 0}
+_stats_lock = threading.Lock()
+
+
+def upstream_stats():
+    return scheduler.stats()
+
+
+def resilience_stats():
+    """Circuit breaker state and hedging counts, for /health"""
+    with _stats_lock:
+        counts = dict(_hedge_counts)
+    counts["hedge_rate"] = round(counts["sent"] / counts["calls"], 4) if counts["calls"] else 0.0
+    return {"breaker": breaker.stats(), "hedging": counts}
+
+
+def _count(field, label=None):
+    with _stats_lock:
+        _hedge_counts[field] += 1
+    if label is not None and field in ("sent", "won", "skipped"):
+        metrics.upstream_hedges.inc(label, field)
+
+
+def _latency_window(label):
+    with _stats_lock:
+        window = _latency_windows.get(label)
+        if window is None:
+            window = _latency_windows[label] = LatencyWindow(config.HEDGE_WINDOW)
+        return window
+
+
+def _hedge_delay(label):
+    """Seconds to wait before hedging a call: the endpoint's HEDGE_PERCENTILE latency, once known"""
+    if not config.HEDGE_ENABLED:
+        return None
+    latency = _latency_window(label).percentile(config.HEDGE_PERCENTILE, config.HEDGE_MIN_SAMPLES)
+    if latency is None:
+        return None
+    return max(latency, config.HEDGE_MIN_DELAY_MS / 1000.0)
+
+
+def _label(endpoint, model):
+    """Metric and latency-window label: the endpoint, plus the model when it isn't MODEL_NAME"""
+    label = endpoint or "unknown"
+    if model and model != config.MODEL_NAME:
+        label = f"{label}@{model.rsplit('/', 1)[-1]}"
+    return label
+
+
+def _is_quota_error(error):
+    """True for upstream rate-limit/quota errors (HTTP 429 / ResourceExhausted)"""
+    return getattr(error, "code", None) == 429 or type(error).__name__ in ("ResourceExhausted", "TooManyRequests")
+
+
+def _prompt_text(contents):
+    if isinstance(contents, str):
+        return contents
+    return "".join(part for part in contents if isinstance(part, str))
+
+
+def _record_usage(endpoint, contents, response):
+    prompt = _prompt_text(contents)
+    try:
+        reply = response.text or ""
+    except Exception:  # blocked replies raise on .text
+        reply = ""
+    metrics.prompt_chars.observe(len(prompt), endpoint)
+    metrics.response_chars.observe(len(reply), endpoint)
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt)
+    reply_tokens = getattr(usage, "candidates_token_count", None) or estimate_tokens(reply)
+    metrics.tokens.inc(endpoint, "prompt", amount=prompt_tokens)
+    metrics.tokens.inc(endpoint, "response", amount=reply_tokens)
+
+
+def _is_timeout_error(error):
+    """True for client-side timeouts (DeadlineExceeded from the Gemini client, TimeoutError)"""
+    return isinstance(error, TimeoutError) or type(error).__name__ in ("DeadlineExceeded", "ReadTimeout", "Timeout")
+
+
+def _attempt(contents, endpoint, model, timeout, cancel):
+    """One model call on the upstream pool; the caller has already taken its scheduler slot"""
+    label = _label(endpoint, model)
+    started = time.perf_counter()
+    try:
+        response = get_backend(model).generate_content(contents, endpoint=endpoint, timeout=timeout, cancel=cancel)
+    except Exception as e:
+        if cancel.is_set():
+            metrics.upstream_calls.inc(label, "cancelled")
+        elif _is_quota_error(e):
+            metrics.upstream_calls.inc(label, "quota")
+            # Stop sending for a while instead of hammering an exhausted quota
+            scheduler.pause(config.QUOTA_BACKOFF_SECONDS)
+            raise UpstreamOverloaded("Model quota exhausted", config.QUOTA_BACKOFF_SECONDS) from e
+        else:
+            metrics.upstream_calls.inc(label, "timeout" if _is_timeout_error(e) else "error")
+        raise
+    finally:
+        scheduler.release()
+        metrics.upstream_latency.observe(time.perf_counter() - started, label)
+    metrics.upstream_calls.inc(label, "ok")
+    _latency_window(label).add(time.perf_counter() - started)
+    _record_usage(label, contents, response)
+    return response
+
+
+def _race(contents, endpoint, model, timeout):
+    """Run the call, plus one hedged duplicate once it is slower than usual; first good reply wins.
+
+    The loser is cancelled (the stub stops at once; a Gemini call runs on
+    until its own timeout, holding its slot). Raises UpstreamTimeout when no
+    attempt answers within ``timeout``.
+    """
+    label = _label(endpoint, model)
+    cancel = threading.Event()
+    deadline = time.monotonic() + timeout
+    primary = _upstream_pool.submit(_attempt, contents, endpoint, model, timeout, cancel)
+    attempts = {primary}
+    delay = _hedge_delay(label)
+    hedge_at = time.monotonic() + delay if delay is not None else None
+    hedge_budget.deposit()
+    _count("calls")
+    error = None
+    try:
+        while attempts:
+            now = time.monotonic()
+            if now >= deadline:
+                _count("timeouts")
+                raise UpstreamTimeout(f"Model call timed out after {timeout:.2f}s", 1.0)
+            if hedge_at is not None and now >= hedge_at:
+                hedge_at = None
+                # Hedges only use spare capacity and budget; they never queue
+                if hedge_budget.try_spend() and scheduler.try_acquire(endpoint):
+                    attempts.add(_upstream_pool.submit(_attempt, contents, endpoint, model, deadline - now, cancel))
+                    _count("sent", label)
+                else:
+                    _count("skipped", label)
+            until = deadline if hedge_at is None else min(deadline, hedge_at)
+            done, attempts = wait(attempts, timeout=until - now, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    # The primary's error is reported unless the hedge answers
+                    error = error if error is not None and future is not primary else e
+                    continue
+                if future is not primary:
+                    _count("won", label)
+                return response
+        if _is_timeout_error(error):
+            _count("timeouts")
+            raise UpstreamTimeout(f"Model call timed out after {timeout:.2f}s", 1.0) from error
+        raise error
+    finally:
+        cancel.set()
+
+
+def _call_upstream(contents, endpoint, model=None):
+    label = _label(endpoint, model)
+    # Fail before queueing when the request has no time left or the circuit is open
+    resilience.call_timeout(config.UPSTREAM_TIMEOUT_SECONDS)
+    probe = breaker.before_call()
+    healthy = None
+    try:
+        waiting_since = time.perf_counter()
+        scheduler.acquire(endpoint, max_wait=resilience.remaining())
+        metrics.upstream_wait.observe(time.perf_counter() - waiting_since, label)
+        try:
+            timeout = resilience.call_timeout(config.UPSTREAM_TIMEOUT_SECONDS)
+        except DeadlineExceeded:
+            scheduler.release()
+            raise
+        response = _race(contents, endpoint, model, timeout)
+        healthy = True
+        return response
+    except UpstreamTimeout:
+        healthy = False
+        raise
+    except UpstreamOverloaded:
+        # Our own queue limits, quota pauses and deadlines say nothing about upstream health
+        raise
+    except Exception:
+        healthy = False
+        raise
+    finally:
+        breaker.record(healthy, probe)
+
+
+def generate_content(contents, endpoint=None, coalesce_key=None, model=None):
+    """Call ``model`` (default MODEL_NAME) through its shared backend once the scheduler grants a slot.
+
+    Raises UpstreamOverloaded when the call can't be scheduled in time or the
+    upstream quota is exhausted, CircuitOpen while the upstream is unhealthy
+    and DeadlineExceeded (UpstreamTimeout for a call that was sent) when the
+    request deadline or UPSTREAM_TIMEOUT_SECONDS runs out.
+
+    Text prompts are coalesced on their exact text. Multimodal calls are only
+    coalesced when the caller supplies ``coalesce_key`` (e.g. one that
+    includes the image hash).
+    """
+    if coalesce_key is None and isinstance(contents, str):
+        coalesce_key = hashlib.sha256(contents.encode("utf-8")).hexdigest()
+    if coalescer is None or coalesce_key is None:
+        return _call_upstream(contents, endpoint, model)
+    return coalescer.do(f"{_label(endpoint, model)}:{coalesce_key}", lambda: _call_upstream(contents, endpoint, model))
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+from cache import normalize_content
+from prefilter import split_sentences
+
+# Deterministic local stand-in for Gemini.
+#
+# Responses are canned but schema-valid for each endpoint, and derived from a
+# hash of the submitted content, so the same input always yields the same
+# claims and verdicts. Latency, upstream errors and malformed output are drawn
+# from a seeded RNG so load tests are repeatable.
+
+CLASSIFICATIONS = ["Accurate", "Misleading", "Unverifiable"]
+
+# Source ids, as the prompts ask the model to cite them
+STUB_SOURCES = ["WHO", "CDC", "MAYO"]
+
+_NUMBERED_CLAIM_RE = re.compile(r"^\[(\d+)\] (.+)$", re.MULTILINE)
+
+
+class StubUpstreamError(Exception):
+    """Simulated upstream failure raised according to the stub's error rate"""
+
+
+class StubTimeout(TimeoutError):
+    """Simulated client-side timeout: the drawn latency was longer than the call's timeout"""
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+def _extract_between(text, start_marker, end_marker):
+    start = text.find(start_marker)
+    if start == -1:
+        return text
+    start += len(start_marker)
+    end = text.find(end_marker, start)
+    return text[start:end if end != -1 else len(text)].strip()
+
+
+def _digest(text, salt=""):
+    return int(hashlib.sha256((salt + normalize_content(text)).encode("utf-8")).hexdigest(), 16)
+
+
+def _stub_claim(sentence, salt="", answers=None):
+    digest = _digest(sentence, salt)
+    classification = (answers or {}).get(normalize_content(sentence))
+    if classification is not None:
+        confidence = 90 + digest % 10
+    else:
+        classification = CLASSIFICATIONS[digest % len(CLASSIFICATIONS)]
+        confidence = 55 + digest % 45
+    return {
+        "claim_text": sentence,
+        "classification": classification,
+        "confidence_score": confidence,
+        "explanation": f"Stub verdict: this claim is treated as {classification.lower()}.",
+        "correct_information": "Stub backend: consult the listed sources for verified information.",
+    }
+
+
+def _stub_claims(text, limit, salt="", answers=None):
+    sentences = [s for s in split_sentences(text) if len(s) >= 12]
+    return [_stub_claim(sentence, salt, answers) for sentence in sentences[:limit]]
+
+
+def _claims_payload(claims):
+    total = len(claims)
+    accurate = sum(1 for c in claims if c["classification"] == "Accurate")
+    misleading = sum(1 for c in claims if c["classification"] == "Misleading")
+    return {
+        "is_health_related": True,
+        "total_claims": total,
+        "accurate_count": accurate,
+        "misleading_count": misleading,
+        "unverifiable_count": total - accurate - misleading,
+        "overall_accuracy_percentage": round(accurate / total * 100) if total else 0,
+        "claims": claims,
+        "sources": STUB_SOURCES,
+        "summary": f"Stub analysis of {total} claim(s).",
+    }
+
+
+def _doctor_payload(content):
+    topic = content.strip().split("\n")[0][:80] or "this topic"
+    return {
+        "is_health_related": True,
+        "response_type": "medical_advice",
+        "condition_overview": f"Stub overview for: {topic}.",
+        "detailed_explanation": "This is a deterministic stub response used for offline testing.",
+        "symptoms": ["Symptom A", "Symptom B"],
+        "causes": ["Cause A"],
+        "treatments": ["Treatment A"],
+        "prevention": "Stub prevention advice.",
+        "when_to_seek_help": "Seek help if symptoms persist.",
+        "important_notes": "Always consult a healthcare professional.",
+        "verified_sources": ["MAYO", "NIH", "WHO", "CDC"],
+    }
+
+
+class StubBackend:
+    """Offline backend with canned, schema-valid JSON and configurable latency/error distributions.
+
+    latency = latency_ms + uniform(0, jitter_ms), plus slow_ms with probability
+    slow_rate. A call raises StubUpstreamError with probability error_rate and
+    returns non-JSON text with probability malformed_rate.
+
+    ``salt`` varies the verdicts (so a second stub model disagrees with the
+    first on some claims). ``answers`` maps normalized claim texts to the
+    classification to return for them, for replaying a labeled corpus.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency_ms=300, jitter_ms=100, slow_rate=0.0, slow_ms=3000,
+                 error_rate=0.0, malformed_rate=0.0, seed=0, salt="", answers=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.salt = salt
+        self.answers = answers or {}
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            latency = self.latency_ms + self._rng.uniform(0, self.jitter_ms)
+            if self._rng.random() < self.slow_rate:
+                latency += self.slow_ms
+            fail = self._rng.random() < self.error_rate
+            malformed = self._rng.random() < self.malformed_rate
+        return latency / 1000.0, fail, malformed
+
+    def generate_content(self, contents, endpoint=None, timeout=None, cancel=None):
+        prompt = contents if isinstance(contents, str) else next(
+            (part for part in contents if isinstance(part, str)), ""
+        )
+        delay, fail, malformed = self._draw()
+        # Like a real client: give up at the timeout, and stop early when cancelled
+        wait = min(delay, timeout) if timeout else delay
+        if wait > 0:
+            if cancel is not None:
+                if cancel.wait(wait):
+                    raise StubUpstreamError("Cancelled (stub backend)")
+            else:
+                time.sleep(wait)
+        if timeout and delay > timeout:
+            raise StubTimeout(f"Simulated upstream timeout after {timeout:.1f}s (stub backend)")
+        if fail:
+            raise StubUpstreamError("Simulated upstream error (stub backend)")
+        if malformed:
+            return StubResponse("Sorry, I cannot produce JSON for this request {")
+
+        if endpoint == "scan-page":
+            text = _extract_between(prompt, "Text to analyze:", "**VERIFIED")
+            payload = {"claims": _stub_claims(text, 25, self.salt, self.answers), "sources": STUB_SOURCES}
+        elif endpoint == "validate-batch":
+            results = [
+                dict(_stub_claim(text, self.salt, self.answers), index=int(index), is_health_related=True)
+                for index, text in _NUMBERED_CLAIM_RE.findall(prompt)
+            ]
+            payload = {"results": results, "sources": STUB_SOURCES}
+        elif endpoint == "doctor-mode":
+            payload = _doctor_payload(_extract_between(prompt, "Content:", "**VERIFIED"))
+        else:
+            content = _extract_between(prompt, "Content:", "**VERIFIED")
+            claims = _stub_claims(content, 10, self.salt, self.answers)
+            payload = _claims_payload(claims or [_stub_claim(content[:200], self.salt, self.answers)])
+        return StubResponse("```json\n" + json.dumps(payload) + "\n```")
@@ -0,0 +1,318 @@
+import atexit
+import bisect
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# In-process metrics rendered in the Prometheus text exposition format.
+#
+# Counters and histograms are updated on the request path; values that other
+# components already track (cache hits, coalescing, decode outcomes) are read
+# at scrape time through registered collector callbacks.
+#
+# Under pre-fork serving a scrape reaches one worker at random. With a shared
+# directory (Registry.share) every worker writes a snapshot of its samples
+# there, and a scrape sums counters and histograms across all of them, so
+# totals cover the whole server and never go backwards when another worker
+# answers. Gauges are per worker and get a "worker" label.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def family(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        samples = [(self.name, dict(zip(self.labels, label_values)), value) for label_values, value in items]
+        return self.name, "counter", self.help, samples
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *label_values):
+        return _Timer(self, label_values)
+
+    def family(self):
+        with self._lock:
+            items = sorted((key, (list(series[0]), series[1], series[2])) for key, series in self._series.items())
+        samples = []
+        for label_values, (counts, total, count) in items:
+            labels = dict(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", dict(labels, le=_format_value(float(bound))), cumulative))
+            samples.append((f"{self.name}_sum", labels, round(total, 6)))
+            samples.append((f"{self.name}_count", labels, count))
+        return self.name, "histogram", self.help, samples
+
+
+class _Timer:
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+        return False
+
+
+def render_families(families):
+    """Prometheus text for [(name, type, help, [(sample name, labels dict, value)])]"""
+    lines = []
+    for name, metric_type, help_text, samples in families:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for sample_name, labels, value in samples:
+            label_text = _format_labels(tuple(labels), tuple(labels.values()))
+            lines.append(f"{sample_name}{label_text} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SharedSnapshots:
+    """Per-process metric snapshots in a directory every worker on the host shares.
+
+    Each process rewrites ``<pid>.json`` every ``interval`` seconds, on every
+    scrape it answers and at exit. Snapshots of exited workers are kept, so
+    their counts stay in the totals; their gauges are dropped.
+    """
+
+    def __init__(self, directory, interval=5.0):
+        self.directory = directory
+        self.interval = interval
+        self.pid = os.getpid()
+        self.path = os.path.join(directory, f"{self.pid}.json")
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, families):
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"pid": self.pid, "written_at": time.time(), "families": families}, f)
+        os.replace(temporary, self.path)
+
+    def read_others(self):
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            if path == self.path:
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                # Removed or half-written by a worker that is being replaced
+                continue
+        return snapshots
+
+    def merge(self, own_families):
+        """This process's families combined with every other worker's last snapshot"""
+        merged = {}
+        snapshots = [{"pid": self.pid, "families": own_families}] + self.read_others()
+        for snapshot in snapshots:
+            alive = snapshot["pid"] == self.pid or _process_alive(snapshot["pid"])
+            for name, metric_type, help_text, samples in snapshot["families"]:
+                family = merged.setdefault(name, (metric_type, help_text, {}))
+                if metric_type == "gauge" and not alive:
+                    continue
+                for sample_name, labels, value in samples:
+                    if metric_type == "gauge":
+                        labels = dict(labels, worker=str(snapshot["pid"]))
+                    key = (sample_name, tuple(sorted(labels.items())))
+                    if key in family[2]:
+                        family[2][key] = (labels, family[2][key][1] + value)
+                    else:
+                        family[2][key] = (labels, value)
+        return [
+            (name, metric_type, help_text, [(key[0], labels, value) for key, (labels, value) in samples.items()])
+            for name, (metric_type, help_text, samples) in merged.items()
+        ]
+
+    def workers(self):
+        """Every worker with a snapshot: pid, whether it is still running and the snapshot's age"""
+        now = time.time()
+        rows = [{"pid": self.pid, "alive": True, "snapshot_age_seconds": 0.0}]
+        for snapshot in self.read_others():
+            rows.append({
+                "pid": snapshot["pid"],
+                "alive": _process_alive(snapshot["pid"]),
+                "snapshot_age_seconds": round(now - snapshot["written_at"], 1),
+            })
+        return rows
+
+
+class Registry:
+    """Holds metrics and scrape-time collectors.
+
+    A collector is a callable returning (name, type, help, [(labels dict, value)]).
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+        self.shared = None
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def families(self):
+        """This process's samples as [(name, type, help, [(sample name, labels dict, value)])]"""
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        families = [metric.family() for metric in metrics]
+        for collector in collectors:
+            for name, metric_type, help_text, samples in collector():
+                families.append((name, metric_type, help_text, [(name, labels, value) for labels, value in samples]))
+        return families
+
+    def share(self, directory, interval=5.0):
+        """Aggregate scrapes across every process writing snapshots to ``directory``"""
+        self.shared = SharedSnapshots(directory, interval)
+        thread = threading.Thread(target=self._sync_loop, name="metrics-sync", daemon=True)
+        thread.start()
+        atexit.register(self._sync)
+        logger.info(f"Metrics shared through {directory} every {interval:g}s")
+
+    def _sync(self):
+        try:
+            self.shared.write(self.families())
+        except Exception as e:
+            logger.warning(f"Could not write the metrics snapshot: {str(e)}")
+
+    def _sync_loop(self):
+        while True:
+            time.sleep(self.shared.interval)
+            self._sync()
+
+    def render(self):
+        families = self.families()
+        if self.shared is not None:
+            self.shared.write(families)
+            families = self.shared.merge(families)
+        return render_families(families)
+
+
+registry = Registry()
+
+START_TIME = time.time()
+
+http_requests = registry.counter(
+    "healthguard_http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status")
+)
+http_latency = registry.histogram(
+    "healthguard_http_request_duration_seconds", "Time to produce a response (first byte for streams)", ("route",)
+)
+upstream_calls = registry.counter(
+    "healthguard_upstream_calls_total", "Model calls by endpoint and outcome", ("endpoint", "outcome")
+)
+upstream_latency = registry.histogram(
+    "healthguard_upstream_duration_seconds", "Model call latency, excluding time waiting for a slot", ("endpoint",)
+)
+upstream_hedges = registry.counter(
+    "healthguard_upstream_hedges_total", "Hedged duplicate model calls: sent, won (answered first) or skipped",
+    ("endpoint", "outcome")
+)
+stale_responses = registry.counter(
+    "healthguard_stale_responses_total", "Expired cached results served while the upstream was unavailable",
+    ("route",)
+)
+upstream_wait = registry.histogram(
+    "healthguard_upstream_slot_wait_seconds", "Time spent waiting for a global upstream slot", ("endpoint",)
+)
+prompt_chars = registry.histogram(
+    "healthguard_prompt_chars", "Prompt size in characters", ("endpoint",), buckets=SIZE_BUCKETS
+)
+response_chars = registry.histogram(
+    "healthguard_response_chars", "Model reply size in characters", ("endpoint",), buckets=SIZE_BUCKETS
+)
+tokens = registry.counter(
+    "healthguard_tokens_total", "Model tokens by endpoint and direction (usage metadata, else estimated)",
+    ("endpoint", "direction")
+)
+prompt_tokens_saved = registry.counter(
+    "healthguard_prompt_tokens_saved_total", "Estimated input tokens saved by compact templates and content budgets",
+    ("endpoint",)
+)
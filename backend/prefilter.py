@@ -0,0 +1,137 @@
+import re
+
+# Local health-relevance prefilter.
+#
+# A curated vocabulary is matched with one compiled regex, so rejecting
+# non-health input or picking candidate claim sentences out of a long page
+# costs microseconds instead of a Gemini round trip.
+
+# Matched as word prefixes ("vaccin" -> vaccine, vaccinated, vaccination)
+HEALTH_STEMS = [
+    # Conditions & diseases
+    "disease", "illness", "infect", "virus", "viral", "bacteri", "cancer", "tumo", "diabet",
+    "asthma", "allerg", "arthrit", "alzheimer", "dementia", "autism", "adhd", "depress",
+    "anxiety", "obes", "hypertens", "cholesterol", "stroke", "heart attack", "cardio", "cardiac",
+    "covid", "coronavirus", "influenza", "pneumonia", "measles", "malaria", "tubercul",
+    "hepatitis", "migraine", "epilep", "insomnia", "syndrome", "disorder", "inflamm",
+    "chronic", "pandemic", "epidemic", "outbreak", "pathogen", "parasit", "fungal",
+    "osteopor", "eczema", "psoria", "acne", "sepsis", "anemi", "leukemi", "lymphoma",
+    "carcino", "toxic", "poison", "overdose", "addict", "fever", "cough", "nause",
+    "diarrh", "fatigue", "headache", "painful", "injur", "wound", "fractur",
+    # Body & physiology
+    "immun", "antibod", "blood", "liver", "kidney", "lung", "brain", "neuro",
+    "muscle", "bone", "skin", "gut", "intestin", "digest", "metabol", "hormon", "insulin",
+    "glucose", "pregnan", "fertil", "menstru", "menopaus", "prostat", "thyroid", "cell",
+    "genetic", "dna", "tissue", "nutrient", "calori", "stomach", "heart", "eyesight", "vision",
+    "growth", "stunt", "teeth", "tooth", "dental", "hearing", "throat", "sinus", "abdom",
+    "spine", "spinal", "nerve", "arter", "bladder", "pancrea", "breast", "uter", "ovar",
+    "testosteron", "estrogen", "sperm", "memory", "aging", "ageing", "wrinkle", "puberty",
+    # Treatment & prevention
+    "vaccin", "vaccine", "immuniz", "medic", "drug", "pharma", "prescri", "antibiotic",
+    "antiviral", "therap", "treat", "cure", "heal", "remed", "surger", "surgic", "chemo",
+    "radiat", "dose", "dosage", "supplement", "vitamin", "mineral", "probiotic", "detox",
+    "homeopath", "herbal", "steroid", "painkill", "ibuprofen", "paracetamol", "acetaminophen",
+    "aspirin", "statin", "opioid", "clinic", "hospital", "doctor", "physician", "nurse",
+    "patient", "diagnos", "symptom", "screening", "prevent", "recover", "rehab", "transplant",
+    # Lifestyle & public health
+    "health", "diet", "nutrition", "protein", "carbohydrat", "sugar", "sodium", "fasting",
+    "exercis", "fitness", "workout", "sleep", "smok", "tobacco", "nicotine", "vaping", "alcohol",
+    "caffein", "vegetabl", "fruit", "sunburn", "hangover",
+    "hygien", "sanit", "steriliz", "mask", "quarantin", "epidemiolog", "mortality", "lifespan",
+    "longevity", "wellness", "mental", "stress", "weight loss", "bmi", "microbiome",
+    # Evidence vocabulary used in health claims
+    "placebo", "clinical trial", "peer-reviewed", "side effect", "risk factor",
+]
+
+# Matched as whole words only; as prefixes these would hit unrelated words
+HEALTH_WORDS = [
+    "flu", "hiv", "aids", "std", "sti", "ill", "sick", "ache", "rash", "cold", "colds",
+    "eat", "eating", "food", "foods", "fat", "fats", "fiber", "fibre", "salt", "water",
+    "pill", "pills", "tablet", "tablets", "pain", "pains", "gene", "genes", "organ", "organs",
+    "eye", "eyes", "ear", "ears", "nose", "hair", "bald", "gum", "gums", "chest", "belly", "joint",
+    "joints", "body", "weight", "coffee", "wine", "grow", "grows", "growing",
+    "cdc", "nih", "fda", "nhs", "ema",
+    "mayo", "webmd", "pubmed", "keto", "vegan", "gluten",
+]
+
+# Word stems that make a sentence read as a factual claim rather than chatter
+CLAIM_CUES = re.compile(
+    r"\b(?:cause[sd]?|cure[sd]?|prevent\w*|reduce[sd]?|increase[sd]?|lower\w*|raise[sd]?|boost\w*|"
+    r"kill\w*|protect\w*|linked|link\w*|lead[s]? to|result\w* in|help\w*|improve[sd]?|"
+    r"reverse[sd]?|detox(?:es|ed)?|cleanse[sd]?|heal[sd]?|burn[sd]?|melt[sd]?|flush(?:es|ed)?|fight[s]?|"
+    r"treat\w*|effective|safe|dangerous|harmful|risk\w*|proven|shown|studies|study|research\w*|"
+    r"is|are|can|will|may|should|must|never|always|every|percent|%)\b",
+    re.IGNORECASE,
+)
+
+_HEALTH_TERM_RE = re.compile(
+    r"\b(?:"
+    + "|".join(re.escape(stem) for stem in sorted(HEALTH_STEMS, key=len, reverse=True))
+    + r")\w*|\b(?:"
+    + "|".join(re.escape(word) for word in sorted(HEALTH_WORDS, key=len, reverse=True))
+    + r")\b",
+    re.IGNORECASE,
+)
+
+# Terminal punctuation only ends a sentence before whitespace, so "2.5 mg" stays whole
+_SENTENCE_END_RE = re.compile(r"[.!?]+[\"'”’)\]]*(?=\s|$)")
+
+# A period after these is not a sentence end: titles, "etc.", "e.g.", initialisms ("U.S.")
+_ABBREVIATION_RE = re.compile(
+    r"\b(?:dr|mr|mrs|ms|prof|st|vs|etc|approx|fig|jr|sr|(?:[a-z]\.)+[a-z])\.$",
+    re.IGNORECASE,
+)
+
+# Bulleted claims can be this short ("Boosts immunity")
+MIN_CANDIDATE_CHARS = 12
+
+
+def health_terms(text):
+    """Return the set of distinct health terms found in ``text``"""
+    if not text:
+        return set()
+    return {match.group(0).lower() for match in _HEALTH_TERM_RE.finditer(text)}
+
+
+def is_health_related(text, min_terms=1):
+    """Cheap local check: does the text mention at least ``min_terms`` distinct health terms?"""
+    return len(health_terms(text)) >= min_terms
+
+
+def split_sentences(text):
+    """Split text into stripped, non-empty sentences (line breaks also end a sentence).
+
+    >>> split_sentences("Taking 2.5 mg of zinc daily shortens colds. Sleep helps too.")
+    ['Taking 2.5 mg of zinc daily shortens colds.', 'Sleep helps too.']
+    >>> split_sentences("Dr. Smith says U.S. studies agree, e.g. on flu. Case closed!")
+    ['Dr. Smith says U.S. studies agree, e.g. on flu.', 'Case closed!']
+    """
+    sentences = []
+    for line in (text or "").split("\n"):
+        start = 0
+        for match in _SENTENCE_END_RE.finditer(line):
+            if match.group(0) == "." and _ABBREVIATION_RE.search(line, 0, match.end()):
+                continue
+            sentences.append(line[start:match.end()])
+            start = match.end()
+        sentences.append(line[start:])
+    return [sentence.strip() for sentence in sentences if sentence.strip()]
+
+
+def extract_candidate_sentences(text, min_terms=1):
+    """Return the sentences of ``text`` that look like health claims, in page order"""
+    candidates = []
+    for sentence in split_sentences(text):
+        if len(sentence) < MIN_CANDIDATE_CHARS:
+            continue
+        if len(health_terms(sentence)) < min_terms:
+            continue
+        if not CLAIM_CUES.search(sentence):
+            continue
+        candidates.append(sentence)
+    return candidates
+
+
+def extract_candidate_text(text, min_terms=1):
+    """Reduce page text to candidate claim sentences, one per line, ready for the scanner prompt"""
+    return "\n".join(extract_candidate_sentences(text, min_terms))
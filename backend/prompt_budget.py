@@ -0,0 +1,110 @@
+import re
+from string import Formatter
+
+from batch import estimate_tokens
+
+# A sentence ends at ., ! or ? (optionally followed by closing quotes or
+# brackets) and whitespace, or at a line break
+_SENTENCE_END_RE = re.compile(r"[.!?][\"'”’)\]]*\s|\n")
+_WHITESPACE_RE = re.compile(r"\s")
+
+
+def truncate_at_boundary(text, max_tokens):
+    """Trim ``text`` to about ``max_tokens``, cutting at a sentence boundary.
+
+    Falls back to the last word boundary, and only cuts mid-word when the text
+    has no boundary in the second half of the allowance. Returns (text, truncated).
+    """
+    max_chars = max(0, max_tokens) * 4
+    if len(text) <= max_chars:
+        return text, False
+    window = text[:max_chars + 1]
+    floor = max_chars // 2
+    sentence_ends = [m.end() for m in _SENTENCE_END_RE.finditer(window) if floor <= m.end() <= max_chars + 1]
+    if sentence_ends:
+        return text[:sentence_ends[-1]].rstrip(), True
+    word_ends = [m.start() for m in _WHITESPACE_RE.finditer(window) if m.start() >= floor]
+    if word_ends:
+        return text[:word_ends[-1]].rstrip(), True
+    return text[:max_chars], True
+
+
+class CompiledTemplate:
+    """A str.format template split once into literal text and field names.
+
+    Escaped braces are resolved up front, so rendering only joins the static
+    pieces with the field values instead of re-parsing kilobytes of
+    instructions per request. Fields must be plain names ("{content}").
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self._pieces = []
+        for literal, field, spec, conversion in Formatter().parse(template):
+            if literal:
+                self._pieces.append((literal, None))
+            if field is not None:
+                if not field.isidentifier() or spec or conversion:
+                    raise ValueError(f"Unsupported template field: {{{field}}}")
+                self._pieces.append((None, field))
+        self.fields = tuple(dict.fromkeys(field for _, field in self._pieces if field))
+        self.static_text = "".join(literal for literal, _ in self._pieces if literal)
+        self.static_tokens = estimate_tokens(self.static_text)
+
+    def format(self, **fields):
+        return "".join(literal if field is None else str(fields[field]) for literal, field in self._pieces)
+
+
+class BuiltPrompt:
+    """A formatted prompt and its token accounting (estimates, ~4 characters per token)"""
+
+    def __init__(self, text, content, prompt_tokens, static_tokens, content_tokens, trimmed_tokens, saved_tokens):
+        self.text = text
+        self.content = content
+        self.prompt_tokens = prompt_tokens
+        self.static_tokens = static_tokens
+        self.content_tokens = content_tokens
+        self.trimmed_tokens = trimmed_tokens
+        self.saved_tokens = saved_tokens
+
+
+class PromptBudget:
+    """Formats one prompt template under a total token budget.
+
+    The template's static text is measured once; whatever remains of
+    ``max_tokens`` is the allowance for the user content, which is cut at a
+    sentence boundary. ``baseline_tokens`` is what the same request cost
+    before the templates were compacted and content was budgeted, and is
+    used to report per-request savings.
+    """
+
+    def __init__(self, template, max_tokens, baseline_static_tokens=0, baseline_content_chars=0):
+        self.template = template if isinstance(template, CompiledTemplate) else CompiledTemplate(template)
+        self.max_tokens = max_tokens
+        self.static_tokens = self.template.static_tokens
+        self.baseline_static_tokens = baseline_static_tokens
+        self.baseline_content_chars = baseline_content_chars
+
+    @property
+    def content_allowance(self):
+        return max(0, self.max_tokens - self.static_tokens)
+
+    def fit_content(self, content):
+        """Content as it will be sent: stripped and cut to the allowance at a sentence boundary"""
+        return truncate_at_boundary(content.strip(), self.content_allowance)[0]
+
+    def build(self, content, **fields):
+        content = content.strip()
+        fitted, _ = truncate_at_boundary(content, self.content_allowance)
+        text = self.template.format(content=fitted, **fields)
+        prompt_tokens = estimate_tokens(text)
+        baseline = self.baseline_static_tokens + estimate_tokens(content[:self.baseline_content_chars])
+        return BuiltPrompt(
+            text=text,
+            content=fitted,
+            prompt_tokens=prompt_tokens,
+            static_tokens=self.static_tokens,
+            content_tokens=estimate_tokens(fitted),
+            trimmed_tokens=estimate_tokens(content) - estimate_tokens(fitted),
+            saved_tokens=baseline - prompt_tokens if baseline else 0,
+        )
@@ -0,0 +1,95 @@
+import hashlib
+import logging
+import re
+from urllib.parse import urldefrag
+
+from cache import ResponseCache, normalize_content
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def split_paragraphs(text):
+    """Split page text (innerText) into stripped, non-empty paragraphs, one per line"""
+    return [line.strip() for line in (text or "").split("\n") if line.strip()]
+
+
+def paragraph_fingerprint(paragraph):
+    return hashlib.sha256(normalize_content(paragraph).encode("utf-8")).hexdigest()[:16]
+
+
+def _words(text):
+    return set(_WORD_RE.findall(normalize_content(text)))
+
+
+def attribute_claims(paragraphs, claims, min_overlap=0.0):
+    """Assign each claim to the paragraph it came from.
+
+    ``paragraphs`` is a list of (fingerprint, text). A claim belongs to the
+    paragraph containing its text; paraphrased claims go to the paragraph with
+    the largest word overlap. With ``min_overlap`` set, a paraphrased claim
+    sharing less than that fraction of its words with its best paragraph is
+    left unattributed. Returns {fingerprint: [claims]}.
+    """
+    attributed = {fingerprint: [] for fingerprint, _ in paragraphs}
+    if not paragraphs:
+        return attributed
+    normalized = [(fingerprint, normalize_content(text)) for fingerprint, text in paragraphs]
+    for claim in claims:
+        claim_text = normalize_content(claim.get("claim_text", ""))
+        owner = next((fingerprint for fingerprint, text in normalized if claim_text and claim_text in text), None)
+        if owner is None:
+            claim_words = _words(claim_text)
+            owner, text = max(normalized, key=lambda item: len(claim_words & _words(item[1])))
+            shared = len(claim_words & _words(text))
+            if min_overlap and (not shared or shared < min_overlap * len(claim_words)):
+                continue
+        attributed[owner].append(claim)
+    return attributed
+
+
+class PageFingerprintStore:
+    """Per-URL paragraph fingerprints and the claims found in each paragraph.
+
+    A re-scan of a known URL only needs to send paragraphs whose fingerprint
+    changed; claims for unchanged paragraphs are reused from the last scan.
+    """
+
+    def __init__(self, max_pages=5000, ttl_seconds=24 * 60 * 60, db_path=None):
+        self._cache = ResponseCache(
+            max_entries=max_pages, ttl_seconds=ttl_seconds, db_path=db_path, table="page_fingerprints"
+        )
+
+    @staticmethod
+    def _key(url):
+        # Fragments don't change the page content
+        return urldefrag(url.strip())[0]
+
+    def diff(self, url, paragraphs):
+        """Compare a page against its last scan.
+
+        Returns (claims reused from unchanged paragraphs as {fingerprint: claims},
+        list of (fingerprint, text) for new or changed paragraphs).
+        """
+        previous = (self._cache.get(self._key(url)) or {}).get("paragraphs", {})
+        reused = {}
+        changed = []
+        seen = set()
+        for paragraph in paragraphs:
+            fingerprint = paragraph_fingerprint(paragraph)
+            if fingerprint in previous:
+                reused[fingerprint] = previous[fingerprint]
+            elif fingerprint not in seen:
+                changed.append((fingerprint, paragraph))
+            seen.add(fingerprint)
+        return reused, changed
+
+    def update(self, url, reused, changed, new_claims):
+        """Record the page as scanned: unchanged paragraphs keep their claims, changed ones get new_claims"""
+        paragraphs = dict(reused)
+        paragraphs.update(attribute_claims(changed, new_claims))
+        self._cache.set(self._key(url), {"paragraphs": paragraphs})
+
+    def stats(self):
+        return self._cache.stats()
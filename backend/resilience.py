@@ -0,0 +1,179 @@
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+
+from scheduler import UpstreamOverloaded
+
+# Deadlines, latency tracking for hedged calls, and a circuit breaker for the
+# model upstream.
+#
+# A request's deadline lives in a context variable, so every model call made
+# while handling it (including calls from worker threads started with a copy
+# of the request's context) is bounded by the time the request has left.
+
+
+class UpstreamUnavailable(UpstreamOverloaded):
+    """The model can't answer in time; handlers may serve a stale cached result instead"""
+
+    status = 503
+
+
+class CircuitOpen(UpstreamUnavailable):
+    status = 503
+
+
+class DeadlineExceeded(UpstreamUnavailable):
+    status = 504
+
+
+class UpstreamTimeout(DeadlineExceeded):
+    """A model call that was sent but did not answer in time (counts against upstream health)"""
+
+
+_deadline = contextvars.ContextVar("healthguard_deadline", default=None)
+
+
+def set_deadline(seconds):
+    """Give the current context ``seconds`` for its model calls (None or 0 = no deadline)"""
+    _deadline.set(time.monotonic() + seconds if seconds else None)
+
+
+def remaining():
+    """Seconds left before the current deadline, or None when there is none"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def call_timeout(limit):
+    """Timeout for the next model call: ``limit``, cut to the time the deadline leaves.
+
+    Raises DeadlineExceeded when the deadline has already passed.
+    """
+    left = remaining()
+    if left is None:
+        return limit
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded before the model call", 1.0)
+    return min(limit, left)
+
+
+class LatencyWindow:
+    """Recent successful call latencies, for picking a hedge delay"""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct, min_samples=1):
+        """Nearest-rank percentile, or None until ``min_samples`` latencies are known"""
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """Fails model calls fast while the upstream is unhealthy.
+
+    Closed, it records the outcome of the last ``window`` calls and opens once
+    at least ``min_calls`` are known and ``failure_ratio`` of them failed.
+    Open, every call is refused with CircuitOpen for ``open_seconds``. Then
+    one probe call is let through (half-open): success closes the circuit,
+    failure opens it again.
+    """
+
+    def __init__(self, window=20, failure_ratio=0.5, min_calls=10, open_seconds=30.0):
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_total = 0
+        self.rejected_total = 0
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _retry_after(self, now):
+        return max(0.0, round(self._opened_at + self.open_seconds - now, 3)) or 1.0
+
+    def _refuse(self, now):
+        self.rejected_total += 1
+        raise CircuitOpen("Model upstream unavailable (circuit open)", self._retry_after(now))
+
+    def before_call(self):
+        """Raise CircuitOpen if the call must not go out; returns True for a half-open probe"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                if now - self._opened_at < self.open_seconds:
+                    self._refuse(now)
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    self._refuse(now)
+                self._probing = True
+                return True
+            return False
+
+    def check(self):
+        """Raise CircuitOpen now if a call would be refused, without taking the probe"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN and now - self._opened_at < self.open_seconds:
+                self._refuse(now)
+            if self.state == HALF_OPEN and self._probing:
+                self._refuse(now)
+
+    def record(self, ok, probe=False):
+        """Record a call outcome: True, False, or None for calls that say nothing about upstream health"""
+        with self._lock:
+            if probe:
+                self._probing = False
+                if ok is None:
+                    return
+                if ok:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+            if ok is None or self.state != CLOSED:
+                return
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures >= self.failure_ratio * len(self._outcomes):
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self.opened_total += 1
+        self._outcomes.clear()
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "state": self.state,
+                "recent_calls": len(self._outcomes),
+                "recent_failures": self._outcomes.count(False),
+                "opened_total": self.opened_total,
+                "rejected_total": self.rejected_total,
+                "retry_after": self._retry_after(now) if self.state == OPEN else 0,
+            }
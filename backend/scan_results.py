@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(text):
+    """Hash of a page's text exactly as submitted.
+
+    Not normalized: stored results carry claim spans (character offsets into
+    the text), and a client answered 304 keeps using the spans it already
+    has, so any whitespace or case change must count as a new page.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def parse_if_none_match(header):
+    """Entity tags listed in an If-None-Match header, without quotes or weak prefixes"""
+    if not header:
+        return set()
+    tags = set()
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tags.add(tag.strip('"'))
+    return tags
+
+
+class ScanResultStore:
+    """Finished /scan-page results keyed by (URL, content hash), in SQLite.
+
+    The database runs in WAL mode so request threads read concurrently through
+    their own connections while a single writer connection, guarded by a lock,
+    stores results. Each result gets a strong ETag derived from the URL, the
+    content hash and ``version``; bumping the version (e.g. when the scanner
+    prompt changes) makes every stored result unreachable.
+    """
+
+    def __init__(self, db_path, version, max_entries=20000, ttl_seconds=24 * 60 * 60, table="scan_results",
+                 stale_seconds=0):
+        self.db_path = db_path
+        self.version = version
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Expired results are kept this much longer for get_stale()
+        self.stale_seconds = stale_seconds
+        self.table = table
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self._writes = 0
+        self._writer = self._connect()
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "url TEXT NOT NULL, content_hash TEXT NOT NULL, version TEXT NOT NULL, etag TEXT NOT NULL, "
+            "value TEXT NOT NULL, stored_at REAL NOT NULL, PRIMARY KEY (url, content_hash))"
+        )
+        self._writer.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_stored_at ON {self.table} (stored_at)"
+        )
+        self._writer.commit()
+        logger.info(f"Scan results stored in {self.db_path} (WAL)")
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        # WAL makes commits durable at checkpoints; a lost result is only a re-scan
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _reader(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self._connect()
+        return db
+
+    def etag(self, url, page_hash):
+        return hashlib.sha256(f"{self.version}\0{url}\0{page_hash}".encode("utf-8")).hexdigest()[:32]
+
+    def _count(self, hit):
+        with self._counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, url, page_hash):
+        """Return (etag, stored output) for the page, or None when it has no fresh result"""
+        row = self._reader().execute(
+            f"SELECT etag, value, stored_at FROM {self.table} WHERE url = ? AND content_hash = ? AND version = ?",
+            (url, page_hash, self.version),
+        ).fetchone()
+        if row is None or (self.ttl_seconds > 0 and time.time() - row[2] > self.ttl_seconds):
+            self._count(False)
+            return None
+        self._count(True)
+        return row[0], json.loads(row[1])
+
+    def get_stale(self, url, page_hash):
+        """Like get(), but also returns a result that expired less than ``stale_seconds`` ago"""
+        row = self._reader().execute(
+            f"SELECT etag, value, stored_at FROM {self.table} WHERE url = ? AND content_hash = ? AND version = ?",
+            (url, page_hash, self.version),
+        ).fetchone()
+        if row is None or (self.ttl_seconds > 0 and time.time() - row[2] > self.ttl_seconds + self.stale_seconds):
+            return None
+        return row[0], json.loads(row[1])
+
+    def has(self, url, page_hash, etag):
+        """True if ``etag`` is still the current result for the page (answers If-None-Match without loading it)"""
+        row = self._reader().execute(
+            f"SELECT stored_at FROM {self.table} WHERE url = ? AND content_hash = ? AND version = ? AND etag = ?",
+            (url, page_hash, self.version, etag),
+        ).fetchone()
+        fresh = row is not None and not (self.ttl_seconds > 0 and time.time() - row[0] > self.ttl_seconds)
+        self._count(fresh)
+        return fresh
+
+    def put(self, url, page_hash, output):
+        """Store a finished scan and return its ETag"""
+        etag = self.etag(url, page_hash)
+        now = time.time()
+        value = json.dumps(output)
+        with self._write_lock:
+            self._writer.execute(
+                f"INSERT OR REPLACE INTO {self.table} (url, content_hash, version, etag, value, stored_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, page_hash, self.version, etag, value, now),
+            )
+            self._writes += 1
+            if self._writes % 64 == 0:
+                self._prune(now)
+            self._writer.commit()
+        return etag
+
+    def _prune(self, now):
+        if self.ttl_seconds > 0:
+            self._writer.execute(
+                f"DELETE FROM {self.table} WHERE stored_at < ?", (now - self.ttl_seconds - self.stale_seconds,)
+            )
+        self._writer.execute(f"DELETE FROM {self.table} WHERE version != ?", (self.version,))
+        self._writer.execute(
+            f"DELETE FROM {self.table} WHERE rowid NOT IN ("
+            f"SELECT rowid FROM {self.table} ORDER BY stored_at DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+
+    def stats(self):
+        with self._write_lock:
+            entries = self._writer.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        with self._counter_lock:
+            return {"entries": entries, "hits": self.hits, "misses": self.misses, "db_path": self.db_path}
@@ -0,0 +1,208 @@
+import contextvars
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cache import normalize_content
+
+logger = logging.getLogger(__name__)
+
+_PARAGRAPH_SPLIT_RE = re.compile(r"\n\s*\n|\n")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def _split_long_piece(piece, max_chars):
+    """Split an oversized paragraph at sentence boundaries, falling back to word boundaries"""
+    sentences = _SENTENCE_SPLIT_RE.split(piece)
+    parts = []
+    for sentence in sentences:
+        if len(sentence) <= max_chars:
+            parts.append(sentence)
+            continue
+        # A single run-on "sentence" longer than a chunk: cut between words
+        current = ""
+        for word in sentence.split(" "):
+            if current and len(current) + 1 + len(word) > max_chars:
+                parts.append(current)
+                current = word
+            else:
+                current = f"{current} {word}" if current else word
+        if current:
+            parts.append(current)
+    # Words longer than a whole chunk (URLs, base64 blobs) are cut hard
+    pieces = []
+    for part in parts:
+        pieces.extend(part[i:i + max_chars] for i in range(0, len(part), max_chars))
+    return [piece for piece in pieces if piece.strip()]
+
+
+def split_into_chunks(text, max_chars):
+    """Split page text into chunks of at most ``max_chars`` without breaking paragraphs or sentences"""
+    if not text:
+        return []
+
+    pieces = []
+    for paragraph in _PARAGRAPH_SPLIT_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) > max_chars:
+            pieces.extend(_split_long_piece(paragraph, max_chars))
+        else:
+            pieces.append(paragraph)
+
+    chunks = []
+    current = []
+    current_len = 0
+    for piece in pieces:
+        added_len = len(piece) + (1 if current else 0)
+        if current and current_len + added_len > max_chars:
+            chunks.append("\n".join(current))
+            current = [piece]
+            current_len = len(piece)
+        else:
+            current.append(piece)
+            current_len += added_len
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def iter_scan_chunks(chunks, scan_fn, max_workers):
+    """Run ``scan_fn`` over every chunk in a bounded thread pool, yielding as chunks finish.
+
+    Yields (chunk_index, result) pairs in completion order, where result is
+    either the (claims, sources) tuple or the exception the chunk raised.
+    """
+    if not chunks:
+        return
+    workers = max(1, min(max_workers, len(chunks)))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan-chunk")
+    try:
+        # Each chunk runs in a copy of the caller's context, so it keeps the request deadline
+        futures = {
+            pool.submit(contextvars.copy_context().run, scan_fn, chunk): index for index, chunk in enumerate(chunks)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                yield index, future.result()
+            except Exception as e:
+                logger.error(f"Chunk {index + 1}/{len(chunks)} scan failed: {str(e)}")
+                yield index, e
+    finally:
+        # A streaming client may disconnect early; don't start chunks nobody will read
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def scan_chunks(chunks, scan_fn, max_workers):
+    """Run ``scan_fn`` over every chunk in a bounded thread pool.
+
+    Returns a list of (claims, sources) tuples in chunk order plus the
+    exceptions of the chunks that failed. A failing chunk contributes no claims
+    instead of failing the whole scan.
+    """
+    results = [([], [])] * len(chunks)
+    errors = []
+    for index, result in iter_scan_chunks(chunks, scan_fn, max_workers):
+        if isinstance(result, Exception):
+            errors.append(result)
+        else:
+            results[index] = result
+    return results, errors
+
+
+class ClaimMerger:
+    """Accumulate claims and sources across chunks, dropping ones already seen"""
+
+    def __init__(self):
+        self.claims = []
+        self.sources = []
+        self._seen_claims = set()
+        self._seen_sources = set()
+
+    def add(self, chunk_claims, chunk_sources):
+        """Merge one chunk's results and return the claims that were new"""
+        new_claims = []
+        for claim in chunk_claims:
+            key = normalize_content(claim.get("claim_text", ""))
+            if not key or key in self._seen_claims:
+                continue
+            self._seen_claims.add(key)
+            new_claims.append(claim)
+        for source in chunk_sources:
+            key = source.get("url") or source.get("name")
+            if not key or key in self._seen_sources:
+                continue
+            self._seen_sources.add(key)
+            self.sources.append(source)
+        self.claims.extend(new_claims)
+        return new_claims
+
+
+def merge_claims(results):
+    """Merge per-chunk results, dropping claims and sources that were already seen"""
+    merger = ClaimMerger()
+    for chunk_claims, chunk_sources in results:
+        merger.add(chunk_claims, chunk_sources)
+    return merger.claims, merger.sources
+
+
+class ScanPlan:
+    """What a page scan decided before calling the model, carried through to the response"""
+
+    def __init__(self, page_text, url=None):
+        self.page_text = page_text
+        self.url = url
+        # CleanedText when boilerplate stripping ran; maps cleaned offsets back to page_text
+        self.cleaned = None
+        # ClaimAligner over page_text, built on first use to place claims in the submitted text
+        self.aligner = None
+        self.scan_text = page_text
+        self.chunks = []
+        self.chunks_total = 0
+        # Claims answered without the model: cross-page verdicts and unchanged paragraphs
+        self.reused_claims = []
+        self.verdicts_reused = 0
+        # Incremental re-scan state for pages we have seen before
+        self.paragraphs_total = 0
+        self.reused_paragraphs = {}
+        self.changed_paragraphs = []
+
+    @property
+    def clean_text(self):
+        """The page text with boilerplate and repeats removed (the page text itself when cleaning is off)"""
+        return self.cleaned.text if self.cleaned is not None else self.page_text
+
+    @property
+    def truncated(self):
+        return self.chunks_total > len(self.chunks)
+
+
+def calculate_statistics(claims):
+    """Calculate percentage statistics for claims"""
+    if not claims:
+        return {
+            "total_claims": 0,
+            "accurate_count": 0,
+            "misleading_count": 0,
+            "unverifiable_count": 0,
+            "accurate_percentage": 0,
+            "misleading_percentage": 0,
+            "unverifiable_percentage": 0
+        }
+    
+    total_claims = len(claims)
+    accurate_count = sum(1 for claim in claims if claim.get('classification') == 'Accurate')
+    misleading_count = sum(1 for claim in claims if claim.get('classification') == 'Misleading')
+    unverifiable_count = sum(1 for claim in claims if claim.get('classification') == 'Unverifiable')
+    
+    return {
+        "total_claims": total_claims,
+        "accurate_count": accurate_count,
+        "misleading_count": misleading_count,
+        "unverifiable_count": unverifiable_count,
+        "accurate_percentage": round((accurate_count / total_claims) * 100) if total_claims > 0 else 0,
+        "misleading_percentage": round((misleading_count / total_claims) * 100) if total_claims > 0 else 0,
+        "unverifiable_percentage": round((unverifiable_count / total_claims) * 100) if total_claims > 0 else 0
+    }
@@ -0,0 +1,232 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+
+# Lower number = served first. Interactive requests from the panel jump ahead
+# of background page scans, which absorb the queueing when quota is tight.
+INTERACTIVE = 0
+BATCH = 1
+BACKGROUND = 2
+
+ENDPOINT_PRIORITIES = {
+    "doctor-mode": INTERACTIVE,
+    "validate": INTERACTIVE,
+    "analyze-multiple": INTERACTIVE,
+    "validate-batch": BATCH,
+    "scan-page": BACKGROUND,
+}
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch", BACKGROUND: "background"}
+
+
+class UpstreamOverloaded(Exception):
+    """Raised when a model call can't be scheduled in time; maps to HTTP 429"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second up to ``burst``.
+
+    A rate of 0 disables limiting. Not thread-safe on its own; the scheduler
+    calls it under its lock.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now):
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, now):
+        """Seconds until a token is available (0 if one is available now)"""
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def take(self):
+        if self.rate > 0:
+            self._tokens -= 1
+
+    def pause(self, seconds, now):
+        """Stop handing out tokens for a while, e.g. after the upstream reported quota exhaustion"""
+        self._refill(now)
+        self._tokens = 0.0
+        self._paused_until = max(self._paused_until, now + seconds)
+
+
+class _Ticket:
+    __slots__ = ("priority", "seq", "granted", "abandoned")
+
+    def __init__(self, priority, seq):
+        self.priority = priority
+        self.seq = seq
+        self.granted = False
+        self.abandoned = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class PriorityScheduler:
+    """Admission control for upstream model calls.
+
+    A call needs a concurrency slot and a rate-limit token. Waiting calls are
+    served strictly by priority, FIFO within a priority. Each priority has a
+    queue-depth limit and a maximum wait; past either, ``acquire`` raises
+    UpstreamOverloaded with a Retry-After estimate instead of queueing forever.
+    """
+
+    def __init__(self, max_concurrency, rate_per_second, burst, max_queue, max_wait_seconds):
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._running = 0
+        self._queued = dict.fromkeys(PRIORITY_NAMES, 0)
+        self.granted = dict.fromkeys(PRIORITY_NAMES, 0)
+        self.rejected = dict.fromkeys(PRIORITY_NAMES, 0)
+
+    def priority_for(self, endpoint):
+        return ENDPOINT_PRIORITIES.get(endpoint, INTERACTIVE)
+
+    def _retry_after(self, priority):
+        ahead = sum(count for p, count in self._queued.items() if p <= priority) + 1
+        rate = self.bucket.rate if self.bucket.rate > 0 else float(self.max_concurrency)
+        return ahead / rate
+
+    def _dispatch(self, now):
+        """Grant the head of the queue while slots and tokens allow; returns the token wait, if any"""
+        while self._heap:
+            head = self._heap[0]
+            if head.abandoned:
+                heapq.heappop(self._heap)
+                continue
+            if self._running >= self.max_concurrency:
+                return None
+            wait = self.bucket.wait_time(now)
+            if wait > 0:
+                return wait
+            heapq.heappop(self._heap)
+            self.bucket.take()
+            self._running += 1
+            self._queued[head.priority] -= 1
+            self.granted[head.priority] += 1
+            head.granted = True
+            self._cond.notify_all()
+        return None
+
+    def _check_queue(self, priority):
+        if self._queued[priority] >= self.max_queue.get(priority, 0):
+            self.rejected[priority] += 1
+            raise UpstreamOverloaded(
+                f"Too many queued {PRIORITY_NAMES[priority]} requests", self._retry_after(priority)
+            )
+
+    def check_admission(self, endpoint):
+        """Raise UpstreamOverloaded now if a call for ``endpoint`` would be turned away.
+
+        Lets streaming routes answer 429 before committing to a 200 response.
+        """
+        with self._cond:
+            self._check_queue(self.priority_for(endpoint))
+
+    def acquire(self, endpoint, max_wait=None):
+        """Wait for a slot; ``max_wait`` (e.g. the request's remaining deadline) can shorten the priority's wait"""
+        priority = self.priority_for(endpoint)
+        with self._cond:
+            self._check_queue(priority)
+            ticket = _Ticket(priority, next(self._seq))
+            heapq.heappush(self._heap, ticket)
+            self._queued[priority] += 1
+            wait = self.max_wait_seconds.get(priority, 0)
+            if max_wait is not None:
+                wait = min(wait, max_wait)
+            deadline = time.monotonic() + wait
+            while True:
+                now = time.monotonic()
+                token_wait = self._dispatch(now)
+                if ticket.granted:
+                    return priority
+                remaining = deadline - now
+                if remaining <= 0:
+                    ticket.abandoned = True
+                    self._queued[priority] -= 1
+                    self.rejected[priority] += 1
+                    # Leaving may unblock lower-priority tickets queued behind this one
+                    self._cond.notify_all()
+                    raise UpstreamOverloaded(
+                        f"Timed out waiting for an upstream slot ({PRIORITY_NAMES[priority]})",
+                        self._retry_after(priority),
+                    )
+                self._cond.wait(min(remaining, token_wait) if token_wait else remaining)
+
+    def try_acquire(self, endpoint):
+        """Take a slot only if one is free right now and nobody is waiting; never queues.
+
+        Used for hedged duplicate calls, which should only use spare capacity.
+        """
+        priority = self.priority_for(endpoint)
+        with self._cond:
+            if any(not ticket.abandoned for ticket in self._heap) or self._running >= self.max_concurrency or self.bucket.wait_time(time.monotonic()) > 0:
+                return False
+            self.bucket.take()
+            self._running += 1
+            self.granted[priority] += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self._running -= 1
+            self._dispatch(time.monotonic())
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        with self._cond:
+            self.bucket.pause(seconds, time.monotonic())
+
+    def slot(self, endpoint):
+        return _Slot(self, endpoint)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "running": self._running,
+                "max_concurrency": self.max_concurrency,
+                "rate_per_second": self.bucket.rate,
+                "queued": {PRIORITY_NAMES[p]: count for p, count in self._queued.items()},
+                "granted": {PRIORITY_NAMES[p]: count for p, count in self.granted.items()},
+                "rejected": {PRIORITY_NAMES[p]: count for p, count in self.rejected.items()},
+            }
+
+
+class _Slot:
+    def __init__(self, scheduler, endpoint):
+        self.scheduler = scheduler
+        self.endpoint = endpoint
+
+    def __enter__(self):
+        self.scheduler.acquire(self.endpoint)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.scheduler.release()
+        return False
@@ -0,0 +1,102 @@
+from urllib.parse import urlparse
+
+# The verified medical sources, keyed by the short identifier the model is
+# asked to return. Responses are expanded from this table on the server, so
+# the model never has to echo names, URLs or descriptions.
+VERIFIED_SOURCES = [
+    # Government & International Health Organizations
+    ("WHO", "World Health Organization (WHO)", "https://www.who.int", "Government", "Global health authority"),
+    ("CDC", "Centers for Disease Control and Prevention (CDC)", "https://www.cdc.gov", "Government",
+     "US national public health institute"),
+    ("NIH", "National Institutes of Health (NIH)", "https://www.nih.gov", "Government",
+     "Primary US medical research agency"),
+    ("FDA", "U.S. Food & Drug Administration (FDA)", "https://www.fda.gov", "Government",
+     "US regulator for drugs, devices and food safety"),
+    ("NHS", "National Health Service (NHS)", "https://www.nhs.uk", "Government", "UK public health service"),
+    ("EMA", "European Medicines Agency (EMA)", "https://www.ema.europa.eu", "Government", "EU medicines regulator"),
+    # Medical Reference & Research Databases
+    ("PUBMED", "PubMed (U.S. National Library of Medicine)", "https://pubmed.ncbi.nlm.nih.gov", "Database",
+     "Index of peer-reviewed biomedical literature"),
+    ("MEDLINEPLUS", "MedlinePlus", "https://medlineplus.gov", "Database",
+     "Consumer health information from the US National Library of Medicine"),
+    ("COCHRANE", "Cochrane Library", "https://www.cochranelibrary.com", "Database",
+     "Systematic reviews of medical evidence"),
+    ("UPTODATE", "UpToDate", "https://www.uptodate.com", "Database", "Evidence-based clinical decision support"),
+    # Trusted Health Information Portals
+    ("MAYO", "Mayo Clinic", "https://www.mayoclinic.org", "Portal", "Leading medical research institution"),
+    ("CLEVELAND", "Cleveland Clinic", "https://my.clevelandclinic.org", "Portal", "Major academic medical center"),
+    ("HOPKINS", "Johns Hopkins Medicine", "https://www.hopkinsmedicine.org", "Portal",
+     "Leading academic medical center"),
+    ("HARVARD", "Harvard Health Publishing", "https://www.health.harvard.edu", "Portal",
+     "Health publishing from Harvard Medical School"),
+    ("WEBMD", "WebMD", "https://www.webmd.com", "Portal", "Physician-reviewed health information"),
+    ("HEALTHLINE", "Healthline", "https://www.healthline.com", "Portal", "Medically reviewed health information"),
+]
+
+# Sources used to pad a response that cites fewer than the minimum
+DEFAULT_SOURCE_IDS = ("WHO", "CDC", "MAYO", "NIH", "MEDLINEPLUS")
+
+# name -> url, as the prompts and older code used it
+VERIFIED_MEDICAL_SOURCES = {name: url for _, name, url, _, _ in VERIFIED_SOURCES}
+
+# One line per source for the prompts: "WHO: World Health Organization (WHO)"
+SOURCE_ID_LIST = "\n".join(f"- {source_id}: {name}" for source_id, name, _, _, _ in VERIFIED_SOURCES)
+
+
+def _host(url):
+    host = urlparse(url if "//" in url else f"//{url}").netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _build_index():
+    """Precompute every spelling a source may come back as: id, name or URL host"""
+    entries = {}
+    index = {}
+    for source_id, name, url, category, credibility in VERIFIED_SOURCES:
+        entries[source_id] = {"name": name, "url": url, "category": category, "credibility": credibility}
+        for alias in (source_id, name, _host(url)):
+            index[alias.casefold()] = source_id
+    return entries, index
+
+
+_ENTRIES, _INDEX = _build_index()
+
+
+def resolve_source(reference):
+    """Map a source id, name, URL or {"name", "url"} object to a source id, or None if unverified"""
+    if isinstance(reference, dict):
+        for key in ("id", "name", "url"):
+            value = reference.get(key)
+            if isinstance(value, str) and resolve_source(value):
+                return resolve_source(value)
+        return None
+    if not isinstance(reference, str) or not reference.strip():
+        return None
+    reference = reference.strip()
+    if "." in reference or "/" in reference:
+        return _INDEX.get(_host(reference).casefold()) or _INDEX.get(reference.casefold())
+    return _INDEX.get(reference.casefold())
+
+
+def expand_sources(references, min_count=3, detailed=False):
+    """Expand source references from a model reply into full source objects.
+
+    Unknown references are dropped, so only verified sources are ever returned.
+    The list is padded from DEFAULT_SOURCE_IDS up to ``min_count``. ``detailed``
+    adds category and credibility (the doctor-mode shape).
+    """
+    if isinstance(references, (str, dict)):
+        references = [references]
+    source_ids = []
+    for reference in references or []:
+        source_id = resolve_source(reference)
+        if source_id and source_id not in source_ids:
+            source_ids.append(source_id)
+    for source_id in DEFAULT_SOURCE_IDS:
+        if len(source_ids) >= min_count:
+            break
+        if source_id not in source_ids:
+            source_ids.append(source_id)
+    if detailed:
+        return [dict(_ENTRIES[source_id]) for source_id in source_ids]
+    return [{"name": _ENTRIES[source_id]["name"], "url": _ENTRIES[source_id]["url"]} for source_id in source_ids]
@@ -0,0 +1,82 @@
+import logging
+
+from cache import ResponseCache, make_cache_key, normalize_content
+from rescan import attribute_claims
+
+logger = logging.getLogger(__name__)
+
+VERDICT_FIELDS = ("claim_text", "classification", "confidence_score", "explanation", "correct_information")
+
+# Share of a paraphrased claim's words that must appear in a sentence to attribute it there
+MIN_CLAIM_OVERLAP = 0.6
+
+
+def verdict_fields(claim):
+    """The subset of a scanned claim worth keeping across pages"""
+    return {field: claim.get(field) for field in VERDICT_FIELDS if field in claim}
+
+
+class VerdictStore:
+    """Claim-level verdicts shared across every page we scan.
+
+    Each entry maps the normalized text of a claim, or of a page sentence the
+    model already looked at, to the list of verdicts found in it. An empty list
+    records "checked, no claims here", and is only written for sentences from a
+    model call that found no claims at all. ``version`` is part of every key, so a
+    new scanner prompt (or a manual bump of HEALTHGUARD_VERDICT_VERSION)
+    starts from an empty store while old entries age out via TTL/LRU.
+    """
+
+    def __init__(self, version, max_entries=50000, ttl_seconds=7 * 24 * 60 * 60, db_path=None):
+        self.version = version
+        self.reused = 0
+        self._cache = ResponseCache(
+            max_entries=max_entries, ttl_seconds=ttl_seconds, db_path=db_path, table="claim_verdicts"
+        )
+
+    def _key(self, text):
+        return make_cache_key("claim-verdict", self.version, text)
+
+    def lookup(self, sentence):
+        """Return stored verdicts for a sentence, or None if it has not been seen"""
+        return self._cache.get(self._key(sentence))
+
+    def split_known(self, sentences):
+        """Partition sentences into (reused verdicts, sentences that still need the model)"""
+        reused = []
+        unseen = []
+        for sentence in sentences:
+            verdicts = self.lookup(sentence)
+            if verdicts is None:
+                unseen.append(sentence)
+            else:
+                reused.extend(verdicts)
+        self.reused += len(reused)
+        return reused, unseen
+
+    def remember(self, sentences, claims):
+        """Store verdicts from one model call over ``sentences``.
+
+        Every claim is stored under its own text. A sentence is stored with the
+        claims attributed to it, so the same sentence on another page is
+        answered without the model. A sentence is only recorded as claim-free
+        when the whole call found no claims; otherwise sentences no claim could
+        be attributed to are left out, since the model may have paraphrased a
+        claim from them beyond recognition.
+        """
+        for claim in claims:
+            key_text = normalize_content(claim.get("claim_text", ""))
+            if key_text:
+                self._cache.set(self._key(key_text), [verdict_fields(claim)])
+        sentences = [sentence for sentence in sentences if sentence.strip()]
+        if not claims:
+            for sentence in sentences:
+                self._cache.set(self._key(sentence), [])
+            return
+        attributed = attribute_claims(list(enumerate(sentences)), claims, MIN_CLAIM_OVERLAP)
+        for position, sentence in enumerate(sentences):
+            if attributed[position]:
+                self._cache.set(self._key(sentence), [verdict_fields(claim) for claim in attributed[position]])
+
+    def stats(self):
+        return dict(self._cache.stats(), reused=self.reused, version=self.version)
@@ -0,0 +1,22 @@
+"""WSGI entry point for pre-fork serving.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Each worker process imports this module after the fork, so the model client,
+the SQLite connections and the upstream scheduler all belong to the worker.
+gunicorn.conf.py calls init_worker() before the worker accepts connections.
+"""
+import config
+from app import app, logger, warm_up
+
+application = app
+
+
+def init_worker():
+    """Warm this worker before its first request when HEALTHGUARD_WARMUP_ON_START is set.
+
+    Otherwise the model client and Pillow load on the first request that
+    needs them, which keeps cold starts short on scale-to-zero platforms.
+    """
+    if config.WARMUP_ON_START:
+        logger.info(f"Worker warmed up (ms): {warm_up()}")
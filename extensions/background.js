@@ -1,4 +1,152 @@
-const API_URL = "http://localhost:5000/scan-page";
+const STREAM_API_URL = "http://localhost:5000/scan-page/stream";
+
+// Stream the page scan as NDJSON so claims can be highlighted as soon as each
+// chunk is classified. Resolves with the final "done" record, which has the
+// same shape as the /scan-page response.
+const SCAN_MAX_ATTEMPTS = 3;
+
+// The last result per URL, with the ETag the backend gave it. Re-scanning an
+// unchanged page sends the ETag back and gets 304, so the panel can reopen
+// without waiting for the model.
+const SCAN_RESULTS_KEY = 'scanResults';
+const SCAN_RESULTS_MAX = 50;
+
+async function getStoredScan(url) {
+    const stored = await chrome.storage.session.get(SCAN_RESULTS_KEY);
+    return (stored[SCAN_RESULTS_KEY] || {})[url] || null;
+}
+
+async function storeScan(url, etag, data) {
+    const stored = await chrome.storage.session.get(SCAN_RESULTS_KEY);
+    const results = stored[SCAN_RESULTS_KEY] || {};
+    delete results[url];
+    results[url] = { etag: etag, data: data };
+    const urls = Object.keys(results);
+    for (const oldUrl of urls.slice(0, Math.max(0, urls.length - SCAN_RESULTS_MAX))) {
+        delete results[oldUrl];
+    }
+    await chrome.storage.session.set({ [SCAN_RESULTS_KEY]: results });
+}
+
+// Page scans are background work: when the backend is overloaded it answers
+// 429 with Retry-After, and we wait and try again instead of failing the scan.
+// Page text compresses well (often 4-6x), so scans are uploaded gzipped.
+async function gzipBody(text) {
+    const stream = new Blob([text]).stream().pipeThrough(new CompressionStream('gzip'));
+    return new Response(stream).arrayBuffer();
+}
+
+async function fetchScanStream(text, url, etag) {
+    const headers = {
+        'Content-Type': 'application/json',
+        'Accept': 'application/x-ndjson'
+    };
+    if (etag) {
+        headers['If-None-Match'] = etag;
+    }
+    let body = JSON.stringify({ text: text, url: url });
+    if (typeof CompressionStream !== 'undefined') {
+        body = await gzipBody(body);
+        headers['Content-Encoding'] = 'gzip';
+    }
+    for (let attempt = 1; ; attempt++) {
+        const response = await fetch(STREAM_API_URL, {
+            method: 'POST',
+            headers: headers,
+            body: body
+        });
+        if (response.status !== 429 || attempt >= SCAN_MAX_ATTEMPTS) {
+            return response;
+        }
+        const retryAfter = parseInt(response.headers.get('Retry-After'), 10) || 5;
+        console.log(`[background.js] Backend busy, retrying scan in ${retryAfter}s`);
+        chrome.runtime.sendMessage({
+            action: "analysisStarted",
+            message: `Server busy, retrying in ${retryAfter}s...`
+        });
+        await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+    }
+}
+
+async function streamPageScan(text, url, tabId) {
+    const previous = url ? await getStoredScan(url) : null;
+    const response = await fetchScanStream(text, url, previous && previous.etag);
+    console.log('[background.js] Backend response status:', response.status);
+    if (response.status === 304 && previous) {
+        // Page unchanged since the last scan: reuse its result
+        chrome.tabs.sendMessage(tabId, { action: "highlightClaimsPartial", claims: previous.data.claims || [] });
+        return previous.data;
+    }
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let finalData = null;
+    let chunksTotal = 0;
+    let chunksDone = 0;
+    let claimsFound = 0;
+
+    const handleRecord = (record) => {
+        if (record.type === 'start') {
+            chunksTotal = record.chunks_scanned;
+        } else if (record.type === 'claims' || record.type === 'chunk_error') {
+            chunksDone += 1;
+            const claims = record.claims || [];
+            claimsFound += claims.length;
+            if (claims.length > 0) {
+                chrome.tabs.sendMessage(tabId, { action: "highlightClaimsPartial", claims: claims });
+            }
+        } else if (record.type === 'reused_claims') {
+            // Verdicts the backend already knew from earlier scans
+            const claims = record.claims || [];
+            claimsFound += claims.length;
+            chrome.tabs.sendMessage(tabId, { action: "highlightClaimsPartial", claims: claims });
+        } else if (record.type === 'done') {
+            finalData = record;
+            return;
+        } else if (record.type === 'error') {
+            throw new Error(record.error);
+        }
+        chrome.runtime.sendMessage({
+            action: "scanProgress",
+            chunksDone: chunksDone,
+            chunksTotal: chunksTotal,
+            claimsFound: claimsFound
+        });
+    };
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let newlineIndex;
+        while ((newlineIndex = buffer.indexOf('\n')) !== -1) {
+            const line = buffer.slice(0, newlineIndex).trim();
+            buffer = buffer.slice(newlineIndex + 1);
+            if (line) {
+                handleRecord(JSON.parse(line));
+            }
+        }
+    }
+    if (buffer.trim()) {
+        handleRecord(JSON.parse(buffer));
+    }
+    if (!finalData) {
+        throw new Error('Scan stream ended before the final summary');
+    }
+    if (response.headers.get('X-Cache') === 'HIT') {
+        // A stored result arrives as a single "done" record, with no per-chunk claims
+        chrome.tabs.sendMessage(tabId, { action: "highlightClaimsPartial", claims: finalData.claims || [] });
+    }
+    const etag = response.headers.get('ETag');
+    if (url && etag && !finalData.chunks_failed) {
+        await storeScan(url, etag, finalData);
+    }
+    return finalData;
+}
 
 // Keep your existing side panel behavior.
 chrome.sidePanel
@@ -50,22 +198,9 @@ chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
             message: "Analyzing health claims..."
         });
         
-        // Send the text to your Flask backend for analysis.
-        fetch(API_URL, {
-            method: 'POST',
-            headers: { 
-                'Content-Type': 'application/json',
-                'Accept': 'application/json'
-            },
-            body: JSON.stringify({ text: request.text })
-        })
-        .then(response => {
-            console.log('[background.js] Backend response status:', response.status);
-            if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
-            }
-            return response.json();
-        })
+        // Stream the text to your Flask backend for analysis; claims are
+        // highlighted progressively as each chunk comes back.
+        streamPageScan(request.text, request.url || sender.tab.url, sender.tab.id)
         .then(data => {
             console.log('[background.js] Received analysis from backend:', data);
             console.log('[background.js] Number of claims found:', data.claims ? data.claims.length : 0);
@@ -77,13 +212,13 @@ chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
                 data: data
             });
             
-            // Send the results (the list of claims) to content.js to be highlighted.
+            // Claims are already highlighted; show the page summary for the full set.
             chrome.tabs.sendMessage(sender.tab.id, {
-                action: "highlightClaims",
+                action: "scanSummary",
                 claims: data.claims || []
             }, (response) => {
                 if (chrome.runtime.lastError) {
-                    console.error('[background.js] Error sending highlightClaims message:', chrome.runtime.lastError);
+                    console.error('[background.js] Error sending scanSummary message:', chrome.runtime.lastError);
                     // Notify panel that highlighting failed
                     chrome.runtime.sendMessage({
                         action: "scanComplete",
@@ -91,7 +226,7 @@ chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
                         message: "Analysis complete, but highlighting failed"
                     });
                 } else {
-                    console.log('[background.js] Successfully sent "highlightClaims" message to content.js.');
+                    console.log('[background.js] Successfully sent "scanSummary" message to content.js.');
                     // Notify panel that everything is complete
                     chrome.runtime.sendMessage({
                         action: "scanComplete",
@@ -10,12 +10,15 @@ if (!window.hasRun) {
         if (request.action === "getText") {
             console.log('[content.js] Received "getText" message.');
             const pageText = document.body.innerText.trim();
+            // Claim spans from the server are offsets into exactly this text
+            window.healthGuardPageText = pageText;
             
             // Only send the message back if there is actual text to analyze.
             if (pageText) {
                 chrome.runtime.sendMessage({
                     action: "sendText",
-                    text: pageText 
+                    text: pageText,
+                    url: window.location.href
                 });
                 console.log('[content.js] Sent page text back to background script.');
             } else {
@@ -33,6 +36,27 @@ if (!window.hasRun) {
             }
         }
 
+        // Streaming scans send each chunk's claims as soon as they are classified...
+        if (request.action === "highlightClaimsPartial") {
+            console.log('[content.js] Received "highlightClaimsPartial" message with claims:', request.claims);
+            if (request.claims && request.claims.length > 0) {
+                ensureHighlightStyles();
+                highlightClaimList(request.claims);
+            }
+        }
+
+        // ...followed by the full claim list once the scan is finished.
+        if (request.action === "scanSummary") {
+            console.log('[content.js] Received "scanSummary" message with claims:', request.claims);
+            if (request.claims && request.claims.length > 0) {
+                ensureHighlightStyles();
+                showSummaryBanner(request.claims);
+                scrollToFirstHighlight();
+            } else {
+                console.log('[content.js] No claims to highlight.');
+            }
+        }
+
         // Handle error messages from background script
         if (request.action === "showError") {
             console.log('[content.js] Received error message:', request.message);
@@ -45,6 +69,16 @@ if (!window.hasRun) {
     function highlightClaimsOnPage(claims) {
         console.log('[content.js] Starting to highlight claims on page.');
         
+        ensureHighlightStyles();
+        showSummaryBanner(claims);
+        highlightClaimList(claims);
+
+        console.log('[content.js] Highlighting complete.');
+        
+        scrollToFirstHighlight();
+    }
+
+    function ensureHighlightStyles() {
         // Add styles only once
         if (!document.getElementById('healthguard-styles')) {
             const style = document.createElement('style');
@@ -177,7 +211,9 @@ if (!window.hasRun) {
             `;
             document.head.appendChild(style);
         }
+    }
 
+    function showSummaryBanner(claims) {
         // Remove any existing banner
         const existingBanner = document.getElementById('healthguard-summary-banner');
         if (existingBanner) {
@@ -218,52 +254,149 @@ if (!window.hasRun) {
             
             document.body.appendChild(summaryBanner);
         }
+    }
+
+    const HIGHLIGHT_CLASSES = {
+        accurate: 'healthguard-highlight-accurate',
+        misleading: 'healthguard-highlight-misleading',
+        unverifiable: 'healthguard-highlight-unverifiable'
+    };
 
-        // Use TreeWalker to find and highlight text nodes without breaking the DOM
+    function highlightClaimList(claims) {
+        // Walk the page's text nodes once for the whole list: each claim is found in a
+        // flattened copy of the page text, then the matching node ranges are wrapped
+        const targets = [];
         claims.forEach(claim => {
-            const classification = claim.classification.toLowerCase();
-            let highlightClass = '';
+            const className = HIGHLIGHT_CLASSES[(claim.classification || '').toLowerCase()];
+            if (className) {
+                claimTargets(claim).forEach(target => targets.push(Object.assign(target, { claim, className })));
+            }
+        });
+        if (targets.length === 0) {
+            return;
+        }
+        // In page order, so each search continues where the previous match ended
+        targets.sort((a, b) => a.start - b.start);
+        addSearchHints(targets);
 
-            if (classification === 'accurate') {
-                highlightClass = 'healthguard-highlight-accurate';
-            } else if (classification === 'misleading') {
-                highlightClass = 'healthguard-highlight-misleading';
-            } else if (classification === 'unverifiable') {
-                highlightClass = 'healthguard-highlight-unverifiable';
+        const index = indexTextNodes();
+        const taken = [];
+        const rangesByNode = new Map();
+        let cursor = 0;
+        targets.forEach(target => {
+            let found = findFree(index.flat, target.needle, Math.max(cursor, target.hint), taken);
+            if (found === -1 && target.fallback && target.fallback !== target.needle) {
+                // Offsets from an older copy of the page; look for the claim text itself
+                target.needle = target.fallback;
+                found = findFree(index.flat, target.needle, 0, taken);
             }
+            if (found === -1) {
+                return;
+            }
+            const end = found + target.needle.length;
+            taken.push([found, end]);
+            cursor = end;
+            for (let k = found; k < end;) {
+                const nodeIndex = index.nodeOf[k];
+                const first = index.offsetOf[k];
+                while (k + 1 < end && index.nodeOf[k + 1] === nodeIndex) {
+                    k++;
+                }
+                const node = index.nodes[nodeIndex];
+                if (!rangesByNode.has(node)) {
+                    rangesByNode.set(node, []);
+                }
+                rangesByNode.get(node).push([first, index.offsetOf[k] + 1, target.claim, target.className]);
+                k++;
+            }
+        });
+
+        rangesByNode.forEach((ranges, node) => {
+            // Right to left, so splitting off one range leaves the earlier offsets valid
+            ranges.sort((a, b) => b[0] - a[0]).forEach(([start, end, claim, className]) => {
+                node.splitText(end);
+                const match = node.splitText(start);
+                const span = document.createElement('span');
+                span.className = className;
+                span.title = `HealthGuard: ${claim.classification}`;
+                span.dataset.claim = claim.claim_text;
+                match.parentNode.insertBefore(span, match);
+                span.appendChild(match);
+            });
+        });
+    }
 
-            if (highlightClass) {
-                highlightTextInDOM(claim.claim_text, highlightClass, claim.classification);
+    function claimTargets(claim) {
+        // One target per span the server located, else the claim text wherever it appears first
+        const fallback = compactText(claim.claim_text || '');
+        const pageText = window.healthGuardPageText;
+        if (pageText && Array.isArray(claim.spans) && claim.spans.length > 0) {
+            return claim.spans
+                .map(([start, end]) => ({ needle: compactText(pageText.slice(start, end)), fallback, start }))
+                .filter(target => target.needle);
+        }
+        return fallback ? [{ needle: fallback, fallback, start: Number.MAX_SAFE_INTEGER }] : [];
+    }
+
+    function addSearchHints(targets) {
+        // A span starting after n non-space characters of innerText starts at or after flattened
+        // position n (text nodes also hold hidden text), which tells repeated claims apart
+        const pageText = window.healthGuardPageText || '';
+        let counted = 0;
+        let hint = 0;
+        targets.forEach(target => {
+            if (target.start < Number.MAX_SAFE_INTEGER) {
+                for (; counted < target.start && counted < pageText.length; counted++) {
+                    if (!/\s/.test(pageText[counted])) {
+                        hint++;
+                    }
+                }
+                target.hint = hint;
+            } else {
+                target.hint = 0;
             }
         });
+    }
 
-        console.log('[content.js] Highlighting complete.');
-        
-        // Scroll to first highlighted element if any
-        const firstHighlight = document.querySelector('[class*="healthguard-highlight-"]');
-        if (firstHighlight) {
-            setTimeout(() => {
-                firstHighlight.scrollIntoView({ 
-                    behavior: 'smooth', 
-                    block: 'center' 
-                });
-            }, 500);
+    function compactText(text) {
+        // innerText and text node contents differ only in whitespace, so match without it
+        return Array.from(text.replace(/\s+/g, ''), lowerChar).join('');
+    }
+
+    function lowerChar(char) {
+        // Characters whose lowercase form has a different length are kept, so offsets stay one-to-one
+        const lower = char.toLowerCase();
+        return lower.length === char.length ? lower : char;
+    }
+
+    function findFree(flat, needle, from, taken) {
+        // First occurrence at or after `from` that doesn't overlap an earlier highlight
+        let found = flat.indexOf(needle, from);
+        while (found !== -1 && taken.some(([start, end]) => found < end && found + needle.length > start)) {
+            found = flat.indexOf(needle, found + 1);
         }
+        if (found === -1 && from > 0) {
+            return findFree(flat, needle, 0, taken);
+        }
+        return found;
     }
 
-    function highlightTextInDOM(searchText, className, classification) {
+    function indexTextNodes() {
+        // Page text without whitespace, lowercased, plus the node and offset of every character
         const walker = document.createTreeWalker(
             document.body,
             NodeFilter.SHOW_TEXT,
             {
                 acceptNode: function(node) {
-                    // Skip already highlighted content and script/style tags
-                    if (node.parentElement.classList.contains('healthguard-highlight-accurate') ||
-                        node.parentElement.classList.contains('healthguard-highlight-misleading') ||
-                        node.parentElement.classList.contains('healthguard-highlight-unverifiable') ||
-                        node.parentElement.tagName === 'SCRIPT' ||
-                        node.parentElement.tagName === 'STYLE' ||
-                        node.parentElement.id === 'healthguard-summary-banner') {
+                    const parent = node.parentElement;
+                    // Skip already highlighted content, script/style tags and our own banner
+                    if (!parent ||
+                        parent.classList.contains('healthguard-highlight-accurate') ||
+                        parent.classList.contains('healthguard-highlight-misleading') ||
+                        parent.classList.contains('healthguard-highlight-unverifiable') ||
+                        parent.tagName === 'SCRIPT' ||
+                        parent.tagName === 'STYLE' ||
+                        parent.closest('#healthguard-summary-banner')) {
                         return NodeFilter.FILTER_REJECT;
                     }
                     return NodeFilter.FILTER_ACCEPT;
@@ -271,33 +404,39 @@ if (!window.hasRun) {
             }
         );
 
-        const textNodes = [];
+        const nodes = [];
+        const nodeOf = [];
+        const offsetOf = [];
+        const chars = [];
         let node;
         while (node = walker.nextNode()) {
-            textNodes.push(node);
-        }
-
-        textNodes.forEach(textNode => {
-            const text = textNode.textContent;
-            const regex = new RegExp(escapeRegex(searchText), "gi");
-            
-            if (regex.test(text)) {
-                const highlightedHTML = text.replace(regex, (match) => 
-                    `<span class="${className}" title="HealthGuard: ${classification}" data-claim="${escapeHtml(searchText)}">${match}</span>`
-                );
-                
-                // Create a temporary container to convert HTML string to DOM elements
-                const temp = document.createElement('div');
-                temp.innerHTML = highlightedHTML;
-                
-                // Replace the text node with the highlighted content
-                const parent = textNode.parentNode;
-                while (temp.firstChild) {
-                    parent.insertBefore(temp.firstChild, textNode);
+            const text = node.textContent;
+            const nodeIndex = nodes.length;
+            nodes.push(node);
+            for (let i = 0; i < text.length; i++) {
+                const char = text[i];
+                if (/\s/.test(char)) {
+                    continue;
                 }
-                parent.removeChild(textNode);
+                chars.push(lowerChar(char));
+                nodeOf.push(nodeIndex);
+                offsetOf.push(i);
             }
-        });
+        }
+        return { flat: chars.join(''), nodes, nodeOf, offsetOf };
+    }
+
+    function scrollToFirstHighlight() {
+        // Scroll to first highlighted element if any
+        const firstHighlight = document.querySelector('[class*="healthguard-highlight-"]');
+        if (firstHighlight) {
+            setTimeout(() => {
+                firstHighlight.scrollIntoView({ 
+                    behavior: 'smooth', 
+                    block: 'center' 
+                });
+            }, 500);
+        }
     }
 
     function showErrorNotification(message) {
@@ -334,10 +473,6 @@ if (!window.hasRun) {
     }
 
     // Utility functions
-    function escapeRegex(string) {
-        return string.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
-    }
-
     function escapeHtml(text) {
         const map = {
             '&': '&amp;',
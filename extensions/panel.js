@@ -135,6 +135,12 @@ class HealthGuardChat {
                     this.updateScanMessage("🔍 Analyzing health claims...");
                     break;
                     
+                case "scanProgress":
+                    this.updateScanMessage(
+                        `🔍 Analyzed ${request.chunksDone}/${request.chunksTotal} sections, ${request.claimsFound} claims found so far...`
+                    );
+                    break;
+                    
                 case "scanResults":
                     this.displayScanResults(request.data);
                     break;